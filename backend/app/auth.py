@@ -2,8 +2,17 @@
 Utilitaires d'authentification (JWT, hash de mot de passe).
 """
 
+import asyncio
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from jose import jwt
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
 import bcrypt
 
 from app.config import get_settings
@@ -15,6 +24,14 @@ SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 7
 
+# Configuration bcrypt
+BCRYPT_ROUNDS = settings.BCRYPT_ROUNDS
+
+# bcrypt libère le GIL : un pool de threads dédié, dimensionné sur les cœurs,
+# hache en parallèle sans occuper les threads des routes (et leurs connexions MySQL)
+PASSWORD_HASH_WORKERS = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
 
 def create_access_token(data: dict) -> str:
     """Crée un token JWT."""
@@ -24,6 +41,125 @@ def create_access_token(data: dict) -> str:
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+class TokenCache:
+    """
+    Cache LRU des tokens déjà vérifiés, indexé par leur signature.
+    Une entrée expire après ttl secondes, et au plus tard avec le token.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, signature: str, token: str):
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                return None
+            cached_token, user, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[signature]
+                return None
+            self._entries.move_to_end(signature)
+        # Même signature mais token différent (payload altéré) : pas de raccourci
+        return user if hmac.compare_digest(cached_token, token) else None
+
+    def set(self, signature: str, token: str, user: dict, token_exp: float):
+        expires_at = min(time.time() + self.ttl, token_exp)
+        with self._lock:
+            self._entries[signature] = (token, user, expires_at)
+            self._entries.move_to_end(signature)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Vérifie un token JWT et retourne l'utilisateur {id, email}.
+    Les tokens déjà vérifiés sont servis depuis token_cache.
+    """
+    signature = token.rpartition('.')[2]
+    user = token_cache.get(signature, token)
+    if user is not None:
+        return user
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Token invalide ou expiré",
+                            headers={"WWW-Authenticate": "Bearer"})
+    if not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Token invalide ou expiré",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+    user = {"id": payload["sub"], "email": payload.get("email")}
+    token_cache.set(signature, token, user, payload.get("exp", time.time() + token_cache.ttl))
+    return user
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+) -> dict:
+    """Dépendance FastAPI : utilisateur authentifié par le header Authorization: Bearer."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Authentification requise",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return decode_access_token(credentials.credentials)
+
+
+async def require_user(request: Request, current_user: dict = Depends(get_current_user)) -> dict:
+    """
+    Dépendance des routers : utilisateur authentifié, et user_id du chemin
+    ou de la query string égal au sien.
+    """
+    user_id = request.path_params.get('user_id') or request.query_params.get('user_id')
+    if user_id and user_id != current_user['id']:
+        raise HTTPException(status_code=403, detail="Accès refusé")
+    return current_user
+
+
+def ensure_same_user(user_id: str, current_user: dict):
+    """Refuse un user_id du corps de la requête qui n'est pas celui de l'appelant."""
+    if user_id != current_user['id']:
+        raise HTTPException(status_code=403, detail="Accès refusé")
+
+
+# Ressources adressées par leur id : table, colonne de l'id, colonne du
+# propriétaire et message 404. Une transaction appartient au propriétaire
+# de son compte source.
+OWNED_RESOURCES = {
+    'account': ("mm_accounts", "acc_id", "acc_usr_id", "Compte non trouvé"),
+    'transaction': ("mm_transactions JOIN mm_accounts ON acc_id = trx_acc_id", "trx_id", "acc_usr_id",
+                    "Transaction non trouvée"),
+    'category': ("mm_categories", "cat_id", "cat_usr_id", "Catégorie non trouvée"),
+    'recurring': ("mm_recurring", "rec_id", "rec_usr_id", "Transaction récurrente non trouvée"),
+    'budget': ("mm_budgets", "bgt_id", "bgt_usr_id", "Budget non trouvé"),
+    'advance': ("mm_advances", "adv_id", "adv_usr_id", "Avance non trouvée"),
+}
+
+
+def ensure_owner(cursor, resource: str, resource_id: str, current_user: dict, detail: str = None):
+    """
+    Refuse une ressource inexistante ou appartenant à un autre utilisateur
+    (404 dans les deux cas : on ne révèle pas qu'elle existe).
+    """
+    table, id_column, owner_column, not_found = OWNED_RESOURCES[resource]
+    cursor.execute(f"SELECT 1 FROM {table} WHERE {id_column} = %s AND {owner_column} = %s",
+                   (resource_id, current_user['id']))
+    if not cursor.fetchone():
+        raise HTTPException(status_code=404, detail=detail or not_found)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Vérifie un mot de passe contre son hash."""
     return bcrypt.checkpw(
@@ -36,5 +172,25 @@ def hash_password(password: str) -> str:
     """Hash un mot de passe avec bcrypt."""
     return bcrypt.hashpw(
         password.encode('utf-8'),
-        bcrypt.gensalt()
+        bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     ).decode('utf-8')
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Vrai si le hash a été calculé avec un autre facteur de coût ($2b$12$...)."""
+    try:
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password exécuté dans le pool bcrypt."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password exécuté dans le pool bcrypt."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, hash_password, password)
@@ -0,0 +1,160 @@
+"""
+Compression des réponses HTTP (brotli ou gzip, négociée via Accept-Encoding).
+
+Les réponses d'au moins COMPRESSION_MINIMUM_SIZE octets sont compressées
+avec l'encodage préféré du client (brotli, sinon gzip). Les médias déjà
+compressés (images, archives...) et les réponses ayant déjà un
+Content-Encoding sont transmis tels quels. Les réponses en flux (export,
+progression d'un import) sont compressées bloc par bloc : chaque bloc est
+vidé (flush) pour que le client le reçoive sans attendre la fin.
+"""
+
+import zlib
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+
+# Types déjà compressés : les recompresser coûte du CPU sans rien gagner
+INCOMPRESSIBLE_TYPES = ('image/', 'video/', 'audio/', 'font/woff')
+INCOMPRESSIBLE_SUBTYPES = {
+    'application/zip', 'application/gzip', 'application/x-gzip',
+    'application/x-brotli', 'application/pdf', 'application/octet-stream',
+}
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """Encodage préféré parmi br et gzip selon Accept-Encoding, None si aucun."""
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    wildcard = weights.get('*', 0.0)
+    candidates = [(weights.get(name, wildcard), name) for name in ('br', 'gzip')]
+    # À poids égal, brotli (premier de la liste) l'emporte
+    weight, name = max(candidates, key=lambda candidate: candidate[0])
+    return name if weight > 0 else None
+
+
+def is_compressible(headers: Headers) -> bool:
+    if 'content-encoding' in headers:
+        return False
+    content_type = headers.get('content-type', '').split(';')[0].strip().lower()
+    return not (content_type.startswith(INCOMPRESSIBLE_TYPES) or content_type in INCOMPRESSIBLE_SUBTYPES)
+
+
+class _Compressor:
+    """Compresseur brotli ou gzip incrémental."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._brotli = None
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compresse un bloc et le vide : il est décodable dès sa réception."""
+        if self._brotli:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        if self._brotli:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._gzip.compress(data) + self._gzip.flush()
+
+
+class CompressionMiddleware:
+    """Middleware ASGI de compression des réponses."""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Retient l'en-tête de la réponse jusqu'au premier bloc pour décider de la compression."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.start_message = message
+            return
+        if message['type'] != 'http.response.body':
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start_message['headers'])
+            if not is_compressible(headers):
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            headers.add_vary_header('Accept-Encoding')
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level,
+                                          self.middleware.brotli_quality)
+            headers['Content-Encoding'] = self.encoding
+            # Représentation différente des octets d'origine : ETag faible
+            etag = headers.get('ETag')
+            if etag and not etag.startswith('W/'):
+                headers['ETag'] = f'W/{etag}'
+            if more_body:
+                # Flux : taille finale inconnue
+                del headers['Content-Length']
+            else:
+                body = self.compressor.finish(body)
+                headers['Content-Length'] = str(len(body))
+                await self._send(self.start_message)
+                await self._send({'type': 'http.response.body', 'body': body})
+                return
+            await self._send(self.start_message)
+
+        if more_body:
+            body = self.compressor.chunk(body)
+        else:
+            body = self.compressor.finish(body)
+        await self._send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
@@ -12,6 +12,41 @@ class Settings(BaseSettings):
     DB_USER: str = "root"
     DB_PASSWORD: str = ""
 
+    # Pool de connexions MySQL
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_IDLE_TIMEOUT: float = 300.0  # secondes avant fermeture d'une connexion inactive
+    DB_POOL_TIMEOUT: float = 30.0  # attente max d'une connexion libre
+    DB_POOL_PING_AFTER: float = 5.0  # inactivité au-delà de laquelle on vérifie la connexion
+
+    # Nombre de threads exécutant les routes (et donc les requêtes bloquantes)
+    DB_EXECUTOR_WORKERS: int = 10
+
+    # Import de relevés bancaires : transactions insérées par transaction SQL
+    IMPORT_BATCH_SIZE: int = 500
+    IMPORT_MAX_SIZE: int = 50 * 1024 * 1024  # taille maximale d'un relevé, en octets
+
+    # Taille maximale des images importées (avatars, icônes), en octets ;
+    # les clients reçoivent les rendus WebP, pas l'original (photos de téléphone acceptées)
+    UPLOAD_MAX_SIZE: int = 16 * 1024 * 1024
+
+    # Rendus WebP des images importées
+    IMAGE_RENDITION_SIZES: list[int] = [32, 64, 128]  # côté max en pixels
+    IMAGE_WORKERS: int = 2  # threads de décodage (borne aussi la mémoire utilisée)
+    IMAGE_MAX_PIXELS: int = 40_000_000  # au-delà, l'image est refusée
+    IMAGE_WEBP_QUALITY: int = 80
+
+    # Planificateur des transactions récurrentes (tous les utilisateurs)
+    RECURRING_SCHEDULER_ENABLED: bool = True
+    RECURRING_SCHEDULER_INTERVAL: float = 3600.0  # secondes entre deux passages
+    RECURRING_BATCH_SIZE: int = 200  # récurrences par transaction SQL
+    RECURRING_WORKERS: int = 2  # lots traités en parallèle
+
+    # Compression des réponses (brotli ou gzip selon le client)
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # octets ; en dessous, réponse envoyée telle quelle
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 0-11 ; 4 reste rapide pour une compression à la volée
+
     # Configuration de l'API
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
@@ -20,6 +55,14 @@ class Settings(BaseSettings):
     # Clé secrète pour les tokens JWT
     SECRET_KEY: str = "votre-cle-secrete-a-changer-en-production"
 
+    # Cache des tokens JWT vérifiés
+    TOKEN_CACHE_SIZE: int = 1024
+    TOKEN_CACHE_TTL: float = 300.0  # secondes
+
+    # Hachage des mots de passe (bcrypt)
+    BCRYPT_ROUNDS: int = 12  # facteur de coût ; les hashs existants sont mis à jour à la connexion
+    PASSWORD_HASH_WORKERS: int = 0  # threads de hachage, 0 = nombre de cœurs
+
     # CORS - origines autorisées pour le frontend
     CORS_ORIGINS: list[str] = ["http://localhost:5173"]
 
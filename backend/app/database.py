@@ -1,11 +1,17 @@
+import threading
+import time
 import pymysql
-from pymysql.cursors import DictCursor
+from pymysql.cursors import DictCursor, SSDictCursor
 from contextlib import contextmanager
 from app.config import get_settings
 
 settings = get_settings()
 
 
+class PoolTimeoutError(Exception):
+    """Levée quand aucune connexion ne se libère avant DB_POOL_TIMEOUT."""
+
+
 def get_connection():
     """
     Crée une nouvelle connexion à la base de données MySQL.
@@ -23,28 +29,239 @@ def get_connection():
     )
 
 
+class ConnectionPool:
+    """
+    Pool de connexions MySQL thread-safe.
+
+    - min_size connexions sont gardées ouvertes même au repos
+    - au plus max_size connexions existent en même temps
+    - une connexion inutilisée depuis plus de idle_timeout secondes est fermée
+    - une connexion inutilisée depuis plus de ping_after secondes est vérifiée
+      (ping) avant d'être prêtée, et remplacée si le serveur l'a coupée
+    """
+
+    def __init__(self, factory, min_size=1, max_size=10, idle_timeout=300.0,
+                 timeout=30.0, ping_after=5.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Taille de pool invalide")
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = []  # pile LIFO de (connexion, dernier usage)
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "failed_pings": 0,
+        }
+
+    def open(self):
+        """Ouvre les min_size connexions initiales."""
+        conns = [self.acquire() for _ in range(self.min_size)]
+        for conn in conns:
+            self.release(conn)
+
+    def _prune_idle(self):
+        """Retire les connexions inactives trop anciennes (appelé sous verrou)."""
+        now = time.monotonic()
+        expired = []
+        keep = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout and self._size - len(expired) > self.min_size:
+                expired.append(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+        self._size -= len(expired)
+        self._stats["closed"] += len(expired)
+        return expired
+
+    def acquire(self):
+        """Emprunte une connexion, en en créant une si le pool n'est pas plein."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Le pool de connexions est fermé")
+                expired = self._prune_idle()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    conn, last_used = None, None
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"Aucune connexion disponible après {self.timeout} s "
+                        f"(max_size={self.max_size})"
+                    )
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+
+        for old in expired:
+            _close_quietly(old)
+
+        try:
+            if conn is None:
+                conn = self._factory()
+                with self._cond:
+                    self._stats["created"] += 1
+            elif time.monotonic() - last_used > self.ping_after:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    _close_quietly(conn)
+                    with self._cond:
+                        self._stats["failed_pings"] += 1
+                        self._stats["closed"] += 1
+                    conn = self._factory()
+                    with self._cond:
+                        self._stats["created"] += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard=False):
+        """Rend une connexion au pool, ou la ferme si elle est inutilisable."""
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._size -= 1
+                self._stats["closed"] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            _close_quietly(conn)
+
+    def close(self):
+        """Ferme toutes les connexions inactives et refuse les nouveaux emprunts."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._size -= len(idle)
+            self._stats["closed"] += len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            _close_quietly(conn)
+
+    def stats(self) -> dict:
+        """Retourne un instantané des statistiques du pool."""
+        with self._cond:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                **self._stats,
+            }
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+pool = ConnectionPool(
+    get_connection,
+    min_size=settings.DB_POOL_MIN_SIZE,
+    max_size=settings.DB_POOL_MAX_SIZE,
+    idle_timeout=settings.DB_POOL_IDLE_TIMEOUT,
+    timeout=settings.DB_POOL_TIMEOUT,
+    ping_after=settings.DB_POOL_PING_AFTER,
+)
+
+
 @contextmanager
 def get_db():
     """
     Context manager pour gérer les connexions à la base de données.
-    Gère automatiquement le commit/rollback et la fermeture de la connexion.
+    Emprunte une connexion au pool, gère automatiquement le commit/rollback
+    puis rend la connexion au pool.
 
     Utilisation:
         with get_db() as (conn, cursor):
             cursor.execute("SELECT * FROM mm_users")
             results = cursor.fetchall()
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    conn = pool.acquire()
+    broken = False
+    try:
+        cursor = conn.cursor()
+    except Exception:
+        pool.release(conn, discard=True)
+        raise
     try:
         yield conn, cursor
         conn.commit()
     except Exception as e:
-        conn.rollback()
+        try:
+            conn.rollback()
+        except Exception:
+            # Connexion coupée en cours de route : on ne la remet pas dans le pool
+            broken = True
         raise e
     finally:
+        try:
+            cursor.close()
+        except Exception:
+            broken = True
+        pool.release(conn, discard=broken)
+
+
+def stream_rows(query, params=(), batch_size=500):
+    """
+    Exécute une requête en lecture avec un curseur côté serveur (non bufferisé)
+    et produit les lignes par lots de batch_size : la mémoire utilisée ne dépend
+    pas du nombre de lignes.
+
+    La connexion reste empruntée tant que le générateur n'est pas épuisé ou
+    fermé. Si la lecture est interrompue (client déconnecté), le reste du
+    résultat est encore en transit : la connexion est fermée plutôt que rendue.
+
+    Utilisation:
+        for rows in stream_rows("SELECT * FROM mm_transactions"):
+            ...
+    """
+    conn = pool.acquire()
+    finished = False
+    try:
+        cursor = conn.cursor(SSDictCursor)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
         cursor.close()
-        conn.close()
+        conn.rollback()
+        finished = True
+    finally:
+        pool.release(conn, discard=not finished)
 
 
 def init_database():
@@ -2,11 +2,18 @@
 Point d'entrée de l'API FastAPI.
 """
 
-from fastapi import FastAPI
+from anyio import to_thread
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.auth import password_executor, require_user
+from app.compression import CompressionMiddleware
 from app.config import get_settings
-from app.database import init_database, test_connection
+from app.database import init_database, test_connection, pool
+from app.responses import FastJSONResponse, FastJSONRoute
+from app.scheduler import scheduler
+from app.services.versions import track_writes
+from app.services.images import image_executor
 from app.routes import (
     auth_router,
     users_router,
@@ -26,7 +33,11 @@ app = FastAPI(
     title="Gestion Comptes API",
     description="API pour la gestion des comptes personnels",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
+# Résultats des routes sérialisés par orjson, sans passer par jsonable_encoder
+# (les routers de app/routes déclarent aussi route_class=FastJSONRoute)
+app.router.route_class = FastJSONRoute
 
 # Configuration CORS pour permettre les requêtes du frontend
 app.add_middleware(
@@ -37,15 +48,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression brotli/gzip des réponses volumineuses (listes, tableaux de bord, exports)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
 
 @app.on_event("startup")
 async def startup():
     """Initialise la base de données au démarrage."""
+    # Les routes sont synchrones (pymysql est bloquant) : FastAPI les exécute
+    # dans le pool de threads d'anyio, borné ici pour ne pas dépasser le pool MySQL
+    to_thread.current_default_thread_limiter().total_tokens = settings.DB_EXECUTOR_WORKERS
     try:
         init_database()
+        pool.open()
     except Exception as e:
         print(f"Erreur lors de l'initialisation: {e}")
 
+    if settings.RECURRING_SCHEDULER_ENABLED:
+        scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Arrête le planificateur et ferme les connexions du pool à l'arrêt."""
+    scheduler.stop()
+    password_executor.shutdown(wait=False)
+    image_executor.shutdown(wait=False)
+    pool.close()
+
 
 # =============================================================================
 # ROUTES DE BASE
@@ -58,12 +93,13 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
+def health_check():
     """Vérifie l'état de santé de l'API et la connexion à la BDD."""
     db_connected = test_connection()
     return {
         "status": "healthy" if db_connected else "degraded",
         "database": "connected" if db_connected else "disconnected",
+        "pool": pool.stats(),
     }
 
 
@@ -71,12 +107,17 @@ async def health_check():
 # INCLUSION DES ROUTERS
 # =============================================================================
 
+# Routes publiques : authentification et catalogue des icônes par défaut
 app.include_router(auth_router)
-app.include_router(users_router)
-app.include_router(accounts_router)
-app.include_router(categories_router)
-app.include_router(transactions_router)
-app.include_router(recurring_router)
 app.include_router(icons_router)
-app.include_router(budgets_router)
-app.include_router(advances_router)
+
+# Autres routes : token JWT requis, user_id du chemin ou de la query string = utilisateur du token ;
+# toute écriture réussie incrémente la version des données de l'utilisateur (ETag des lectures)
+authenticated = [Depends(require_user), Depends(track_writes)]
+app.include_router(users_router, dependencies=authenticated)
+app.include_router(accounts_router, dependencies=authenticated)
+app.include_router(categories_router, dependencies=authenticated)
+app.include_router(transactions_router, dependencies=authenticated)
+app.include_router(recurring_router, dependencies=authenticated)
+app.include_router(budgets_router, dependencies=authenticated)
+app.include_router(advances_router, dependencies=authenticated)
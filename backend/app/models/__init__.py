@@ -6,7 +6,7 @@ from app.models.auth import LoginRequest, RegisterRequest
 from app.models.user import UserProfileUpdate
 from app.models.account import AccountCreate, AccountUpdate
 from app.models.category import CategoryCreate, CategoryUpdate
-from app.models.transaction import TransactionCreate, TransactionUpdate
+from app.models.transaction import TransactionCreate, TransactionUpdate, TransactionBatchCreate
 from app.models.recurring import RecurringCreate, RecurringUpdate
 from app.models.budget import BudgetCreate, BudgetUpdate, BudgetCheckRequest, BudgetOrderUpdate
 
@@ -25,6 +25,7 @@ __all__ = [
     # Transaction
     "TransactionCreate",
     "TransactionUpdate",
+    "TransactionBatchCreate",
     # Recurring
     "RecurringCreate",
     "RecurringUpdate",
@@ -2,7 +2,10 @@
 Modèles Pydantic pour les transactions.
 """
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# Nombre maximum de transactions par requête d'import groupé
+MAX_BATCH_SIZE = 1000
 
 
 class TransactionCreate(BaseModel):
@@ -23,3 +26,11 @@ class TransactionUpdate(BaseModel):
     amount: float | None = None
     description: str | None = None
     date: str | None = None
+
+
+class TransactionBatchCreate(BaseModel):
+    """Création groupée de transactions (import d'historique)."""
+    transactions: list[TransactionCreate] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+    # True: les transactions valides sont créées malgré les erreurs des autres
+    # False: tout ou rien
+    allow_partial: bool = False
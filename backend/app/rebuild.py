@@ -0,0 +1,39 @@
+"""
+Reconstruit les tables dérivées (fermeture des catégories, agrégats mensuels,
+compteurs de budgets) à partir des données source. La version des données
+des utilisateurs concernés est incrémentée dans la même transaction : leurs
+clients ne gardent pas une copie calculée avec les anciennes tables.
+
+Utilisation:
+    python -m app.rebuild              # tous les utilisateurs
+    python -m app.rebuild <user_id>    # un seul utilisateur
+"""
+
+import sys
+
+from app.database import get_db
+from app.services.aggregates import rebuild_monthly_aggregates
+from app.services.budgets import rebuild_budget_spending
+from app.services.categories import rebuild_category_closure
+from app.services.versions import bump_data_versions
+
+
+def rebuild(user_id: str = None):
+    """Reconstruit toutes les tables dérivées dans une seule transaction."""
+    with get_db() as (conn, cursor):
+        closure = rebuild_category_closure(cursor, user_id)
+        aggregates = rebuild_monthly_aggregates(cursor, user_id)
+        spending = rebuild_budget_spending(cursor, user_id)
+        if user_id:
+            user_ids = [user_id]
+        else:
+            cursor.execute("SELECT usr_id FROM mm_users")
+            user_ids = [row['usr_id'] for row in cursor.fetchall()]
+        bump_data_versions(cursor, user_ids)
+    print(f"Fermeture des catégories reconstruite: {closure} lignes")
+    print(f"Agrégats mensuels reconstruits: {aggregates} lignes")
+    print(f"Compteurs de budgets reconstruits: {spending} lignes")
+
+
+if __name__ == "__main__":
+    rebuild(sys.argv[1] if len(sys.argv) > 1 else None)
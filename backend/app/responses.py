@@ -0,0 +1,71 @@
+"""
+Sérialisation JSON rapide des réponses (orjson).
+
+Les routes renvoient des dicts issus de DictCursor, pleins de Decimal,
+date et datetime. Par défaut, FastAPI les parcourt récursivement avec
+jsonable_encoder avant de les sérialiser : FastJSONRoute remet directement
+le résultat de la route à FastJSONResponse, qui le sérialise en une passe
+avec orjson (date et datetime natifs, Decimal converti comme le faisait
+jsonable_encoder).
+"""
+
+import functools
+import inspect
+from decimal import Decimal
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    """Types inconnus d'orjson."""
+    if isinstance(value, Decimal):
+        # Même résultat que jsonable_encoder : entier si pas de décimales
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    return jsonable_encoder(value)
+
+
+def dumps(content, option: int = 0) -> bytes:
+    return orjson.dumps(content, default=_default, option=OPTIONS | option)
+
+
+class FastJSONResponse(JSONResponse):
+    """Réponse JSON sérialisée par orjson."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _direct(call, status_code: int):
+    """Enveloppe une route : son résultat va tel quel à FastJSONResponse."""
+    def respond(result):
+        if isinstance(result, Response):
+            return result
+        return FastJSONResponse(result, status_code=status_code)
+
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            return respond(await call(*args, **kwargs))
+    else:
+        @functools.wraps(call)
+        def endpoint(*args, **kwargs):
+            return respond(call(*args, **kwargs))
+    return endpoint
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route dont le résultat n'est pas repassé par jsonable_encoder.
+    Les routes avec un response_model gardent la validation de FastAPI.
+    """
+
+    def get_route_handler(self):
+        if self.response_model is None:
+            # Signature déjà analysée : seul l'appel est remplacé
+            self.dependant.call = _direct(self.dependant.call, self.status_code or 200)
+        return super().get_route_handler()
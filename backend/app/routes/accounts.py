@@ -2,19 +2,37 @@
 Bank account management routes.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
 from datetime import date, timedelta
 from calendar import monthrange
+from pathlib import Path
+import codecs
+import io
+import json
+import tempfile
 import uuid
 
+from app.config import get_settings
+from app.auth import ensure_owner, ensure_same_user, get_current_user
 from app.database import get_db
 from app.models.account import AccountCreate, AccountUpdate
+from app.services.aggregates import record_transactions
+from app.services.dashboard import build_category_comparison
+from app.services.projection import load_schedules, project_balances
+from app.services.statements import FORMAT_EXTENSIONS, STATEMENT_FORMATS, import_statement
+from app.services.uploads import UploadTooLargeError, copy_upload
+from app.services.versions import keep_data_version
+from app.services.pagination import (
+    TRANSACTION_ORDER, TRANSACTION_SEEK, InvalidCursorError, decode_cursor, paginate, seek_params,
+)
+from app.responses import FastJSONRoute
 
-router = APIRouter(prefix="/accounts", tags=["Accounts"])
+router = APIRouter(prefix="/accounts", tags=["Accounts"], route_class=FastJSONRoute)
 
 
 @router.get("/{account_id}")
-async def get_account(account_id: str):
+def get_account(account_id: str, current_user: dict = Depends(get_current_user)):
     """Get an account by ID."""
     with get_db() as (conn, cursor):
         cursor.execute("""
@@ -22,8 +40,8 @@ async def get_account(account_id: str):
                    acc_balance as balance, acc_currency as currency, acc_icon as icon,
                    acc_color as color, created_at
             FROM mm_accounts
-            WHERE acc_id = %s
-        """, (account_id,))
+            WHERE acc_id = %s AND acc_usr_id = %s
+        """, (account_id, current_user['id']))
         account = cursor.fetchone()
 
     if not account:
@@ -32,8 +50,9 @@ async def get_account(account_id: str):
 
 
 @router.post("")
-async def create_account(request: AccountCreate):
+def create_account(request: AccountCreate, current_user: dict = Depends(get_current_user)):
     """Create a new account."""
+    ensure_same_user(request.user_id, current_user)
     with get_db() as (conn, cursor):
         account_id = str(uuid.uuid4())
         cursor.execute("""
@@ -55,12 +74,10 @@ async def create_account(request: AccountCreate):
 
 
 @router.put("/{account_id}")
-async def update_account(account_id: str, request: AccountUpdate):
+def update_account(account_id: str, request: AccountUpdate, current_user: dict = Depends(get_current_user)):
     """Update an account."""
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT acc_id FROM mm_accounts WHERE acc_id = %s", (account_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Compte non trouvé")
+        ensure_owner(cursor, 'account', account_id, current_user)
 
         # Map request fields to database columns
         field_mapping = {
@@ -97,12 +114,21 @@ async def update_account(account_id: str, request: AccountUpdate):
 
 
 @router.delete("/{account_id}")
-async def delete_account(account_id: str):
+def delete_account(account_id: str, current_user: dict = Depends(get_current_user)):
     """Delete an account and all its transactions."""
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT acc_id FROM mm_accounts WHERE acc_id = %s", (account_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Compte non trouvé")
+        ensure_owner(cursor, 'account', account_id, current_user)
+
+        # Retire des agrégats et des compteurs de budgets les transactions du compte
+        # (ses agrégats sont aussi supprimés en cascade, pas mm_budget_spending)
+        # et les virements reçus d'autres comptes, comptés dans le compte source
+        cursor.execute("""
+            SELECT trx_acc_id as account_id, trx_cat_id as category_id, trx_type as type,
+                   trx_amount as amount, trx_date as date
+            FROM mm_transactions
+            WHERE trx_acc_id = %s OR trx_target_acc_id = %s
+        """, (account_id, account_id))
+        record_transactions(cursor, cursor.fetchall(), sign=-1)
 
         cursor.execute("DELETE FROM mm_transactions WHERE trx_acc_id = %s OR trx_target_acc_id = %s",
                        (account_id, account_id))
@@ -113,27 +139,130 @@ async def delete_account(account_id: str):
 
 
 @router.get("/{account_id}/transactions")
-async def get_account_transactions(account_id: str, limit: int = 50, offset: int = 0):
-    """Get transactions for an account with pagination."""
+def get_account_transactions(
+    account_id: str,
+    limit: int = 50,
+    offset: int = 0,
+    page_cursor: str = Query(None, alias="cursor"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get transactions for an account with pagination.
+
+    Pass the returned next_cursor as cursor to get the next page (keyset
+    pagination); offset is still supported when no cursor is given.
+    """
+    try:
+        key = decode_cursor(page_cursor) if page_cursor else None
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+    select = """
+        SELECT t.trx_id as id, t.trx_acc_id as account_id, t.trx_target_acc_id as target_account_id,
+               t.trx_cat_id as category_id, t.trx_rec_id as recurring_id, t.trx_type as type,
+               t.trx_amount as amount, t.trx_description as description, t.trx_date as date,
+               t.created_at, c.cat_name as category_name, c.cat_icon as category_icon,
+               c.cat_color as category_color
+        FROM mm_transactions t
+        LEFT JOIN mm_categories c ON t.trx_cat_id = c.cat_id
+    """
+
+    with get_db() as (conn, cursor):
+        ensure_owner(cursor, 'account', account_id, current_user)
+        if key:
+            # Une branche par index (compte source / compte cible) : chacune lit
+            # au plus limit + 1 lignes à partir du curseur
+            seek = seek_params(key)
+            cursor.execute(f"""
+                (
+                    {select}
+                    WHERE t.trx_acc_id = %s AND {TRANSACTION_SEEK}
+                    ORDER BY {TRANSACTION_ORDER}
+                    LIMIT %s
+                )
+                UNION ALL
+                (
+                    {select}
+                    WHERE t.trx_target_acc_id = %s AND t.trx_acc_id != %s AND {TRANSACTION_SEEK}
+                    ORDER BY {TRANSACTION_ORDER}
+                    LIMIT %s
+                )
+                ORDER BY date DESC, created_at DESC, id DESC
+                LIMIT %s
+            """, [account_id, *seek, limit + 1,
+                  account_id, account_id, *seek, limit + 1,
+                  limit + 1])
+        else:
+            cursor.execute(f"""
+                {select}
+                WHERE t.trx_acc_id = %s OR t.trx_target_acc_id = %s
+                ORDER BY {TRANSACTION_ORDER}
+                LIMIT %s OFFSET %s
+            """, (account_id, account_id, limit + 1, offset))
+        transactions, next_cursor = paginate(cursor.fetchall(), limit)
+    return {"transactions": transactions, "next_cursor": next_cursor}
+
+
+@router.post("/{account_id}/import", dependencies=[Depends(keep_data_version)])
+def import_account_statement(
+    account_id: str,
+    file: UploadFile = File(...),
+    format: str = None,
+    encoding: str = "utf-8-sig",
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Import a bank statement (CSV, OFX/QFX or QIF) into an account.
+
+    The format is taken from the file extension unless given. The response
+    streams one JSON line of progress per inserted batch, then a final line
+    with "done": true (or "error"). Rows already imported are skipped.
+    """
+    statement_format = format or FORMAT_EXTENSIONS.get(Path(file.filename or '').suffix.lower())
+    if statement_format not in STATEMENT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format de relevé non supporté (csv, ofx, qif)")
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        raise HTTPException(status_code=400, detail="Encodage inconnu")
+
     with get_db() as (conn, cursor):
         cursor.execute("""
-            SELECT t.trx_id as id, t.trx_acc_id as account_id, t.trx_target_acc_id as target_account_id,
-                   t.trx_cat_id as category_id, t.trx_rec_id as recurring_id, t.trx_type as type,
-                   t.trx_amount as amount, t.trx_description as description, t.trx_date as date,
-                   t.created_at, c.cat_name as category_name, c.cat_icon as category_icon,
-                   c.cat_color as category_color
-            FROM mm_transactions t
-            LEFT JOIN mm_categories c ON t.trx_cat_id = c.cat_id
-            WHERE t.trx_acc_id = %s OR t.trx_target_acc_id = %s
-            ORDER BY t.trx_date DESC, t.created_at DESC
-            LIMIT %s OFFSET %s
-        """, (account_id, account_id, limit, offset))
-        transactions = cursor.fetchall()
-    return {"transactions": transactions}
+            SELECT acc_id as id, acc_usr_id as user_id FROM mm_accounts
+            WHERE acc_id = %s AND acc_usr_id = %s
+        """, (account_id, current_user['id']))
+        account = cursor.fetchone()
+    if not account:
+        raise HTTPException(status_code=404, detail="Compte non trouvé")
+
+    # Le fichier reçu est fermé dès que la route retourne : on le recopie par
+    # blocs dans un fichier temporaire que le flux de réponse lira ligne à ligne
+    settings = get_settings()
+    statement = tempfile.TemporaryFile()
+    try:
+        copy_upload(file.file, statement, settings.IMPORT_MAX_SIZE)
+    except UploadTooLargeError as e:
+        statement.close()
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        statement.close()
+        raise
+    statement.seek(0)
+    batch_size = settings.IMPORT_BATCH_SIZE
+
+    def progress():
+        try:
+            lines = io.TextIOWrapper(statement, encoding=encoding, errors='replace', newline='')
+            for step in import_statement(lines, statement_format, account, batch_size):
+                yield json.dumps(step) + "\n"
+        finally:
+            statement.close()
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
 
 
 @router.get("/{account_id}/dashboard")
-async def get_account_dashboard(account_id: str):
+def get_account_dashboard(account_id: str, current_user: dict = Depends(get_current_user)):
     """Get all dashboard data for a specific account."""
     today = date.today()
     first_day_current_month = today.replace(day=1)
@@ -144,20 +273,20 @@ async def get_account_dashboard(account_id: str):
         cursor.execute("""
             SELECT acc_id as id, acc_usr_id as user_id, acc_name as name, acc_type as type,
                    acc_balance as balance, acc_currency as currency, acc_icon as icon, acc_color as color
-            FROM mm_accounts WHERE acc_id = %s
-        """, (account_id,))
+            FROM mm_accounts WHERE acc_id = %s AND acc_usr_id = %s
+        """, (account_id, current_user['id']))
         account = cursor.fetchone()
         if not account:
             raise HTTPException(status_code=404, detail="Compte non trouvé")
 
         cursor.execute("""
             SELECT
-                COALESCE(SUM(CASE WHEN trx_type = 'income' THEN trx_amount ELSE 0 END), 0) as total_income,
-                COALESCE(SUM(CASE WHEN trx_type = 'expense' THEN trx_amount ELSE 0 END), 0) as total_expense,
-                COUNT(*) as transaction_count
-            FROM mm_transactions
-            WHERE trx_acc_id = %s AND trx_date BETWEEN %s AND %s
-        """, (account_id, first_day_current_month, last_day_current_month))
+                COALESCE(SUM(CASE WHEN mag_type = 'income' THEN mag_total ELSE 0 END), 0) as total_income,
+                COALESCE(SUM(CASE WHEN mag_type = 'expense' THEN mag_total ELSE 0 END), 0) as total_expense,
+                CAST(COALESCE(SUM(mag_count), 0) AS SIGNED) as transaction_count
+            FROM mm_monthly_aggregates
+            WHERE mag_acc_id = %s AND mag_month = %s
+        """, (account_id, first_day_current_month))
         monthly_totals = cursor.fetchone()
 
         cursor.execute("""
@@ -174,149 +303,7 @@ async def get_account_dashboard(account_id: str):
         """, (account_id, thirty_one_days_ago))
         expenses_by_category = cursor.fetchall()
 
-        MOIS_FR = {
-            1: 'Jan', 2: 'Fév', 3: 'Mar', 4: 'Avr',
-            5: 'Mai', 6: 'Juin', 7: 'Juil', 8: 'Août',
-            9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Déc'
-        }
-
-        def get_month_range(year, month):
-            first_day = date(year, month, 1)
-            last_day = date(year, month, monthrange(year, month)[1])
-            return first_day, last_day
-
-        def get_month_data_from_transactions(cursor, account_id, first_day, last_day):
-            cursor.execute("""
-                SELECT c.cat_name, c.cat_color, COALESCE(SUM(t.trx_amount), 0) as total
-                FROM mm_transactions t
-                LEFT JOIN mm_categories c ON t.trx_cat_id = c.cat_id
-                WHERE t.trx_acc_id = %s AND t.trx_type = 'expense'
-                  AND t.trx_date BETWEEN %s AND %s
-                GROUP BY c.cat_id, c.cat_name, c.cat_color
-            """, (account_id, first_day, last_day))
-            expenses = {row['cat_name'] or 'Sans catégorie': {'total': float(row['total']), 'color': row['cat_color'] or '#6b7280'} for row in cursor.fetchall()}
-
-            cursor.execute("""
-                SELECT COALESCE(SUM(trx_amount), 0) as total
-                FROM mm_transactions
-                WHERE trx_acc_id = %s AND trx_type = 'income'
-                  AND trx_date BETWEEN %s AND %s
-            """, (account_id, first_day, last_day))
-            total_income = float(cursor.fetchone()['total'])
-
-            total_expenses = sum(cat['total'] for cat in expenses.values())
-            reste = max(0, total_income - total_expenses)
-
-            return {
-                'expenses': expenses,
-                'total_income': total_income,
-                'total_expenses': total_expenses,
-                'reste': reste
-            }
-
-        def get_month_data_from_recurring(cursor, account_id):
-            cursor.execute("""
-                SELECT c.cat_name, c.cat_color, COALESCE(SUM(r.rec_amount), 0) as total
-                FROM mm_recurring r
-                LEFT JOIN mm_categories c ON r.rec_cat_id = c.cat_id
-                WHERE r.rec_acc_id = %s AND r.rec_type = 'expense' AND r.rec_is_active = TRUE
-                GROUP BY c.cat_id, c.cat_name, c.cat_color
-            """, (account_id,))
-            expenses = {row['cat_name'] or 'Sans catégorie': {'total': float(row['total']), 'color': row['cat_color'] or '#6b7280'} for row in cursor.fetchall()}
-
-            cursor.execute("""
-                SELECT COALESCE(SUM(rec_amount), 0) as total
-                FROM mm_recurring
-                WHERE rec_acc_id = %s AND rec_type = 'income' AND rec_is_active = TRUE
-            """, (account_id,))
-            total_income = float(cursor.fetchone()['total'])
-
-            total_expenses = sum(cat['total'] for cat in expenses.values())
-            reste = max(0, total_income - total_expenses)
-
-            return {
-                'expenses': expenses,
-                'total_income': total_income,
-                'total_expenses': total_expenses,
-                'reste': reste
-            }
-
-        current_year = today.year
-        months_config = []
-
-        for month in range(1, 13):
-            is_future = month > today.month
-            months_config.append({
-                'year': current_year,
-                'month': month,
-                'is_forecast': is_future
-            })
-
-        comparison_months = []
-        all_categories = set()
-        category_colors = {}
-
-        for config in months_config:
-            y, m = config['year'], config['month']
-            first_day, last_day = get_month_range(y, m)
-
-            if config['is_forecast']:
-                current_data = get_month_data_from_recurring(cursor, account_id)
-            else:
-                current_data = get_month_data_from_transactions(cursor, account_id, first_day, last_day)
-
-            first_day_ly, last_day_ly = get_month_range(y - 1, m)
-            last_year_data = get_month_data_from_transactions(cursor, account_id, first_day_ly, last_day_ly)
-
-            for cat_name, cat_data in current_data['expenses'].items():
-                all_categories.add(cat_name)
-                if cat_name not in category_colors:
-                    category_colors[cat_name] = cat_data['color']
-            for cat_name, cat_data in last_year_data['expenses'].items():
-                all_categories.add(cat_name)
-                if cat_name not in category_colors:
-                    category_colors[cat_name] = cat_data['color']
-
-            month_name = MOIS_FR[m]
-
-            comparison_months.append({
-                'month': month_name,
-                'is_forecast': config['is_forecast'],
-                'current_year': {'year': y, 'data': current_data},
-                'last_year': {'year': y - 1, 'data': last_year_data}
-            })
-
-        comparison_data = {
-            'months': [m['month'] for m in comparison_months],
-            'categories': list(all_categories),
-            'category_colors': category_colors,
-            'current_year': current_year,
-            'last_year': current_year - 1,
-            'data': []
-        }
-
-        for month_data in comparison_months:
-            current = month_data['current_year']['data']
-            last = month_data['last_year']['data']
-
-            comparison_data['data'].append({
-                'month': month_data['month'],
-                'is_forecast': month_data['is_forecast'],
-                'current_year': {
-                    'year': month_data['current_year']['year'],
-                    'categories': {cat: current['expenses'].get(cat, {}).get('total', 0) for cat in all_categories},
-                    'total_income': current['total_income'],
-                    'total_expenses': current['total_expenses'],
-                    'reste': current['reste']
-                },
-                'last_year': {
-                    'year': month_data['last_year']['year'],
-                    'categories': {cat: last['expenses'].get(cat, {}).get('total', 0) for cat in all_categories},
-                    'total_income': last['total_income'],
-                    'total_expenses': last['total_expenses'],
-                    'reste': last['reste']
-                }
-            })
+        comparison_data = build_category_comparison(cursor, account_id, today)
 
         cursor.execute("""
             SELECT t.trx_id as id, t.trx_amount as amount, t.trx_description as description,
@@ -342,26 +329,16 @@ async def get_account_dashboard(account_id: str):
         """, (account_id, today))
         last_incomes = cursor.fetchall()
 
-        cursor.execute("""
-            SELECT r.rec_id as id, r.rec_type as type, r.rec_amount as amount,
-                   r.rec_description as description, r.rec_next_occurrence as next_occurrence,
-                   r.rec_frequency as frequency, c.cat_name as category_name,
-                   c.cat_icon as category_icon, c.cat_color as category_color
-            FROM mm_recurring r
-            LEFT JOIN mm_categories c ON r.rec_cat_id = c.cat_id
-            WHERE r.rec_acc_id = %s
-              AND r.rec_is_active = TRUE
-              AND r.rec_next_occurrence BETWEEN %s AND %s
-            ORDER BY r.rec_next_occurrence ASC
-        """, (account_id, today, last_day_current_month))
-        remaining_recurring = cursor.fetchall()
-
-        forecasted_balance = float(account['balance'])
-        for rec in remaining_recurring:
-            if rec['type'] == 'income':
-                forecasted_balance += float(rec['amount'])
-            else:
-                forecasted_balance -= float(rec['amount'])
+        schedules = load_schedules(cursor, account_id=account_id)
+
+    # Une récurrence hebdomadaire peut tomber plusieurs fois d'ici la fin du mois
+    remaining_recurring = []
+    for recurring, schedule in schedules:
+        occurrences = schedule.count_between(today, last_day_current_month)
+        if occurrences:
+            remaining_recurring.append({**recurring, 'occurrences': occurrences})
+    projection = project_balances([account], schedules, today, last_day_current_month)
+    forecasted_balance = projection['total']['projected_balance']
 
     return {
         "account": account,
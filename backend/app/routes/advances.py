@@ -2,19 +2,23 @@
 Routes pour la gestion des avances (prêts en attente de remboursement).
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional
 from datetime import date as date_module
 import uuid
 
+from app.auth import ensure_owner, ensure_same_user, get_current_user
 from app.database import get_db
 from app.models.advance import AdvanceCreate, AdvanceUpdate, AdvancePayment
+from app.services.aggregates import record_transactions
+from app.services.categories import insert_category_closure
+from app.responses import FastJSONRoute
 
-router = APIRouter(prefix="/advances", tags=["Advances"])
+router = APIRouter(prefix="/advances", tags=["Advances"], route_class=FastJSONRoute)
 
 
 @router.get("")
-async def get_advances(
+def get_advances(
     user_id: str,
     direction: Optional[str] = Query(None, description="Filtrer par direction: given, received"),
     status: Optional[str] = Query(None, description="Filtrer par statut: pending, partial, paid"),
@@ -75,7 +79,7 @@ async def get_advances(
 
 
 @router.post("/create-categories")
-async def create_advance_categories(user_id: str):
+def create_advance_categories(user_id: str):
     """
     Crée les catégories pour les avances:
     - Avances (expense): quand je prête de l'argent
@@ -98,6 +102,7 @@ async def create_advance_categories(user_id: str):
                 INSERT INTO mm_categories (cat_id, cat_usr_id, cat_name, cat_type, cat_icon, cat_color, cat_is_default)
                 VALUES (%s, %s, 'Avances', 'expense', '/default/icons/handshake.png', '#f97316', TRUE)
             """, (cat_id, user_id))
+            insert_category_closure(cursor, cat_id)
             created.append('Avances')
 
         # Remboursements (income) - quand on me rembourse
@@ -111,6 +116,7 @@ async def create_advance_categories(user_id: str):
                 INSERT INTO mm_categories (cat_id, cat_usr_id, cat_name, cat_type, cat_icon, cat_color, cat_is_default)
                 VALUES (%s, %s, 'Remboursements', 'income', '/default/icons/refresh.png', '#22c55e', TRUE)
             """, (cat_id, user_id))
+            insert_category_closure(cursor, cat_id)
             created.append('Remboursements')
 
         # Catégories pour les avances reçues (on m'a prêté)
@@ -125,6 +131,7 @@ async def create_advance_categories(user_id: str):
                 INSERT INTO mm_categories (cat_id, cat_usr_id, cat_name, cat_type, cat_icon, cat_color, cat_is_default)
                 VALUES (%s, %s, 'Emprunts', 'income', '/default/icons/wallet.png', '#f97316', TRUE)
             """, (cat_id, user_id))
+            insert_category_closure(cursor, cat_id)
             created.append('Emprunts')
 
         # Remboursement d'emprunt (expense) - quand je rembourse
@@ -138,19 +145,21 @@ async def create_advance_categories(user_id: str):
                 INSERT INTO mm_categories (cat_id, cat_usr_id, cat_name, cat_type, cat_icon, cat_color, cat_is_default)
                 VALUES (%s, %s, 'Remboursement d''emprunt', 'expense', '/default/icons/money-send.png', '#dc2626', TRUE)
             """, (cat_id, user_id))
+            insert_category_closure(cursor, cat_id)
             created.append("Remboursement d'emprunt")
 
     return {"created": created, "message": f"Catégories créées: {', '.join(created)}" if created else "Toutes les catégories existent déjà"}
 
 
 @router.post("")
-async def create_advance(request: AdvanceCreate):
+def create_advance(request: AdvanceCreate, current_user: dict = Depends(get_current_user)):
     """
     Crée une nouvelle avance et génère automatiquement une transaction.
     - direction='given': j'ai prêté → transaction expense (catégorie "Avances")
     - direction='received': on m'a prêté → transaction income (catégorie "Emprunts")
     Si skip_transaction=True, ne crée pas de transaction.
     """
+    ensure_same_user(request.user_id, current_user)
     # Valider la direction
     if request.direction not in ['given', 'received']:
         raise HTTPException(status_code=400, detail="Direction invalide. Valeurs acceptées: given, received")
@@ -212,6 +221,13 @@ async def create_advance(request: AdvanceCreate):
                 transaction_id, request.account_id, category['cat_id'],
                 request.amount, trx_type, transaction_description, request.date
             ))
+            record_transactions(cursor, [{
+                'account_id': request.account_id,
+                'category_id': category['cat_id'],
+                'type': trx_type,
+                'amount': request.amount,
+                'date': request.date,
+            }])
 
         advance_id = str(uuid.uuid4())
         cursor.execute("""
@@ -254,7 +270,7 @@ async def create_advance(request: AdvanceCreate):
 
 
 @router.get("/summary")
-async def get_advances_summary(
+def get_advances_summary(
     user_id: str,
     direction: Optional[str] = Query(None, description="Filtrer par direction: given, received")
 ):
@@ -310,7 +326,7 @@ async def get_advances_summary(
 
 
 @router.get("/{advance_id}")
-async def get_advance(advance_id: str):
+def get_advance(advance_id: str, current_user: dict = Depends(get_current_user)):
     """
     Récupère une avance par son ID.
     """
@@ -336,8 +352,8 @@ async def get_advance(advance_id: str):
                 acc.acc_color as account_color
             FROM mm_advances a
             JOIN mm_accounts acc ON a.adv_acc_id = acc.acc_id
-            WHERE a.adv_id = %s
-        """, (advance_id,))
+            WHERE a.adv_id = %s AND a.adv_usr_id = %s
+        """, (advance_id, current_user['id']))
         advance = cursor.fetchone()
 
     if not advance:
@@ -347,13 +363,14 @@ async def get_advance(advance_id: str):
 
 
 @router.put("/{advance_id}")
-async def update_advance(advance_id: str, request: AdvanceUpdate):
+def update_advance(advance_id: str, request: AdvanceUpdate, current_user: dict = Depends(get_current_user)):
     """
     Met à jour une avance.
     """
     with get_db() as (conn, cursor):
-        # Vérifier que l'avance existe
-        cursor.execute("SELECT adv_id, adv_amount FROM mm_advances WHERE adv_id = %s", (advance_id,))
+        # Vérifier que l'avance existe et appartient à l'utilisateur
+        cursor.execute("SELECT adv_id, adv_amount FROM mm_advances WHERE adv_id = %s AND adv_usr_id = %s",
+                       (advance_id, current_user['id']))
         existing = cursor.fetchone()
         if not existing:
             raise HTTPException(status_code=404, detail="Avance non trouvée")
@@ -434,7 +451,7 @@ async def update_advance(advance_id: str, request: AdvanceUpdate):
 
 
 @router.post("/{advance_id}/payment")
-async def record_payment(advance_id: str, request: AdvancePayment):
+def record_payment(advance_id: str, request: AdvancePayment, current_user: dict = Depends(get_current_user)):
     """
     Enregistre un remboursement (partiel ou total) pour une avance.
     - direction='given': je reçois un remboursement → transaction income (catégorie "Remboursements")
@@ -445,8 +462,8 @@ async def record_payment(advance_id: str, request: AdvancePayment):
         cursor.execute("""
             SELECT adv_id, adv_usr_id, adv_acc_id, adv_amount, adv_amount_received,
                    adv_status, adv_direction, adv_person, adv_description
-            FROM mm_advances WHERE adv_id = %s
-        """, (advance_id,))
+            FROM mm_advances WHERE adv_id = %s AND adv_usr_id = %s
+        """, (advance_id, current_user['id']))
         advance = cursor.fetchone()
 
         if not advance:
@@ -518,6 +535,13 @@ async def record_payment(advance_id: str, request: AdvancePayment):
                 transaction_id, advance['adv_acc_id'], category['cat_id'],
                 request.amount, trx_type, transaction_description, today
             ))
+            record_transactions(cursor, [{
+                'account_id': advance['adv_acc_id'],
+                'category_id': category['cat_id'],
+                'type': trx_type,
+                'amount': request.amount,
+                'date': today,
+            }])
 
         # Déterminer le nouveau statut
         if remaining == 0:
@@ -569,14 +593,12 @@ async def record_payment(advance_id: str, request: AdvancePayment):
 
 
 @router.delete("/{advance_id}")
-async def delete_advance(advance_id: str):
+def delete_advance(advance_id: str, current_user: dict = Depends(get_current_user)):
     """
     Supprime une avance.
     """
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT adv_id FROM mm_advances WHERE adv_id = %s", (advance_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Avance non trouvée")
+        ensure_owner(cursor, 'advance', advance_id, current_user)
 
         cursor.execute("DELETE FROM mm_advances WHERE adv_id = %s", (advance_id,))
 
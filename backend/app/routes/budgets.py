@@ -4,23 +4,27 @@ Budget hierarchy is independent from category hierarchy.
 Same category can appear in multiple parent budgets.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from datetime import date
 from calendar import monthrange
 import uuid
 
+from app.auth import ensure_owner, ensure_same_user, get_current_user
 from app.database import get_db
 from app.models.budget import BudgetCreate, BudgetUpdate, BudgetCheckRequest, BudgetOrderUpdate
+from app.services.budgets import rebuild_budget_spending
+from app.responses import FastJSONRoute
 
-router = APIRouter(prefix="/budgets", tags=["Budgets"])
+router = APIRouter(prefix="/budgets", tags=["Budgets"], route_class=FastJSONRoute)
 
 
 @router.post("")
-async def create_budget(request: BudgetCreate):
+def create_budget(request: BudgetCreate, current_user: dict = Depends(get_current_user)):
     """
     Create a new budget for a category.
     Budget hierarchy is independent from category hierarchy.
     """
+    ensure_same_user(request.user_id, current_user)
     with get_db() as (conn, cursor):
         # Si c'est un budget enfant, vérifier que le parent existe
         if request.parent_budget_id:
@@ -61,8 +65,8 @@ async def create_budget(request: BudgetCreate):
 
         # Vérifier que la catégorie existe et est une dépense
         cursor.execute("""
-            SELECT cat_id, cat_type FROM mm_categories WHERE cat_id = %s
-        """, (request.category_id,))
+            SELECT cat_id, cat_type FROM mm_categories WHERE cat_id = %s AND cat_usr_id = %s
+        """, (request.category_id, request.user_id))
         category = cursor.fetchone()
         if not category:
             raise HTTPException(status_code=404, detail="Catégorie non trouvée")
@@ -74,6 +78,7 @@ async def create_budget(request: BudgetCreate):
             INSERT INTO mm_budgets (bgt_id, bgt_usr_id, bgt_cat_id, bgt_parent_id, bgt_amount)
             VALUES (%s, %s, %s, %s, %s)
         """, (budget_id, request.user_id, request.category_id, request.parent_budget_id, request.amount))
+        rebuild_budget_spending(cursor, budget_ids=[budget_id])
 
         cursor.execute("""
             SELECT b.bgt_id as id, b.bgt_cat_id as category_id, b.bgt_parent_id as parent_budget_id,
@@ -89,10 +94,12 @@ async def create_budget(request: BudgetCreate):
 
 
 @router.put("/{budget_id}")
-async def update_budget(budget_id: str, request: BudgetUpdate):
+def update_budget(budget_id: str, request: BudgetUpdate, current_user: dict = Depends(get_current_user)):
     """Update a budget."""
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT bgt_id, bgt_usr_id, bgt_parent_id FROM mm_budgets WHERE bgt_id = %s", (budget_id,))
+        cursor.execute("""
+            SELECT bgt_id, bgt_usr_id, bgt_parent_id FROM mm_budgets WHERE bgt_id = %s AND bgt_usr_id = %s
+        """, (budget_id, current_user['id']))
         existing = cursor.fetchone()
         if not existing:
             raise HTTPException(status_code=404, detail="Budget non trouvé")
@@ -101,8 +108,8 @@ async def update_budget(budget_id: str, request: BudgetUpdate):
         if request.category_id is not None:
             # Check that the new category exists and is an expense
             cursor.execute("""
-                SELECT cat_id, cat_type FROM mm_categories WHERE cat_id = %s
-            """, (request.category_id,))
+                SELECT cat_id, cat_type FROM mm_categories WHERE cat_id = %s AND cat_usr_id = %s
+            """, (request.category_id, current_user['id']))
             category = cursor.fetchone()
             if not category:
                 raise HTTPException(status_code=404, detail="Catégorie non trouvée")
@@ -121,6 +128,7 @@ async def update_budget(budget_id: str, request: BudgetUpdate):
 
             cursor.execute("UPDATE mm_budgets SET bgt_cat_id = %s WHERE bgt_id = %s",
                           (request.category_id, budget_id))
+            rebuild_budget_spending(cursor, budget_ids=[budget_id])
 
         # Update amount if provided
         if request.amount is not None:
@@ -141,15 +149,13 @@ async def update_budget(budget_id: str, request: BudgetUpdate):
 
 
 @router.delete("/{budget_id}")
-async def delete_budget(budget_id: str):
+def delete_budget(budget_id: str, current_user: dict = Depends(get_current_user)):
     """
     Delete a budget.
     Child budgets are automatically deleted via CASCADE.
     """
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT bgt_id FROM mm_budgets WHERE bgt_id = %s", (budget_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Budget non trouvé")
+        ensure_owner(cursor, 'budget', budget_id, current_user)
 
         # La suppression en cascade des enfants est gérée par la FK ON DELETE CASCADE
         cursor.execute("DELETE FROM mm_budgets WHERE bgt_id = %s", (budget_id,))
@@ -158,7 +164,7 @@ async def delete_budget(budget_id: str):
 
 
 @router.get("/{budget_id}/available-categories")
-async def get_available_categories_for_child_budget(budget_id: str, user_id: str):
+def get_available_categories_for_child_budget(budget_id: str, user_id: str):
     """
     Get categories available to add as child budgets.
     Excludes:
@@ -3,24 +3,38 @@ Category management routes.
 Supports hierarchical categories with parent/child relationships.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 import uuid
 
+from app.auth import ensure_owner, ensure_same_user, get_current_user
 from app.database import get_db
 from app.models.category import CategoryCreate, CategoryUpdate
+from app.services.aggregates import uncategorize_category, rebuild_monthly_aggregates
+from app.services.budgets import rebuild_budget_spending
+from app.services.categories import (
+    insert_category_closure, is_descendant, move_category_closure, remove_category_closure,
+)
+from app.services.category_template import provision_default_categories
+from app.services.http_cache import conditional_json, etag_matches, not_modified
+from app.services.versions import version_etag
+from app.responses import FastJSONRoute
 
-router = APIRouter(prefix="/categories", tags=["Categories"])
+router = APIRouter(prefix="/categories", tags=["Categories"], route_class=FastJSONRoute)
 
 
 @router.get("")
-async def get_categories(user_id: str = None):
+def get_categories(request: Request, user_id: str = None):
     """
     Get categories for a user.
     All categories belong to a specific user (no more global default categories).
     Includes parent_id for hierarchical display.
+    ETag: data version of the user.
     """
     with get_db() as (conn, cursor):
         if user_id:
+            etag = version_etag(cursor, user_id, "categories")
+            if etag_matches(request, etag):
+                return not_modified(etag, "private, no-cache")
             cursor.execute("""
                 SELECT cat_id as id, cat_usr_id as user_id, cat_parent_id as parent_id,
                        cat_name as name, cat_type as type, cat_icon as icon,
@@ -33,18 +47,19 @@ async def get_categories(user_id: str = None):
             # Sans user_id, retourner une liste vide (plus de catégories globales)
             return {"categories": []}
         categories = cursor.fetchall()
-    return {"categories": categories}
+    return conditional_json(request, {"categories": categories}, "private, no-cache", etag=etag)
 
 
 @router.post("")
-async def create_category(request: CategoryCreate):
+def create_category(request: CategoryCreate, current_user: dict = Depends(get_current_user)):
     """Create a new custom category with optional parent."""
+    ensure_same_user(request.user_id, current_user)
     with get_db() as (conn, cursor):
         # Validation du parent si fourni
         if request.parent_id:
             cursor.execute("""
-                SELECT cat_id, cat_type FROM mm_categories WHERE cat_id = %s
-            """, (request.parent_id,))
+                SELECT cat_id, cat_type FROM mm_categories WHERE cat_id = %s AND cat_usr_id = %s
+            """, (request.parent_id, current_user['id']))
             parent = cursor.fetchone()
             if not parent:
                 raise HTTPException(status_code=404, detail="Catégorie parente non trouvée")
@@ -59,6 +74,7 @@ async def create_category(request: CategoryCreate):
             INSERT INTO mm_categories (cat_id, cat_usr_id, cat_parent_id, cat_name, cat_type, cat_icon, cat_color, cat_is_default)
             VALUES (%s, %s, %s, %s, %s, %s, %s, FALSE)
         """, (category_id, request.user_id, request.parent_id, request.name, request.type, request.icon, request.color))
+        insert_category_closure(cursor, category_id, request.parent_id)
 
         cursor.execute("""
             SELECT cat_id as id, cat_usr_id as user_id, cat_parent_id as parent_id,
@@ -72,12 +88,13 @@ async def create_category(request: CategoryCreate):
 
 
 @router.put("/{category_id}")
-async def update_category(category_id: str, request: CategoryUpdate):
+def update_category(category_id: str, request: CategoryUpdate, current_user: dict = Depends(get_current_user)):
     """Update a category (name, icon, color, parent)."""
     with get_db() as (conn, cursor):
         cursor.execute("""
-            SELECT cat_id, cat_type FROM mm_categories WHERE cat_id = %s
-        """, (category_id,))
+            SELECT cat_id, cat_usr_id, cat_type, cat_parent_id FROM mm_categories
+            WHERE cat_id = %s AND cat_usr_id = %s
+        """, (category_id, current_user['id']))
         category = cursor.fetchone()
         if not category:
             raise HTTPException(status_code=404, detail="Catégorie non trouvée")
@@ -89,10 +106,13 @@ async def update_category(category_id: str, request: CategoryUpdate):
             # Une catégorie ne peut pas être son propre parent
             if parent_id == category_id:
                 raise HTTPException(status_code=400, detail="Une catégorie ne peut pas être son propre parent")
+            # Ni l'enfant d'une de ses descendantes (cycle)
+            if is_descendant(cursor, parent_id, category_id):
+                raise HTTPException(status_code=400, detail="Une catégorie ne peut pas être rattachée à une de ses sous-catégories")
 
             cursor.execute("""
-                SELECT cat_id, cat_type FROM mm_categories WHERE cat_id = %s
-            """, (parent_id,))
+                SELECT cat_id, cat_type FROM mm_categories WHERE cat_id = %s AND cat_usr_id = %s
+            """, (parent_id, current_user['id']))
             parent = cursor.fetchone()
             if not parent:
                 raise HTTPException(status_code=404, detail="Catégorie parente non trouvée")
@@ -126,6 +146,11 @@ async def update_category(category_id: str, request: CategoryUpdate):
                 UPDATE mm_categories SET {', '.join(updates)} WHERE cat_id = %s
             """, values)
 
+        if 'parent_id' in request_data and request_data['parent_id'] != category['cat_parent_id']:
+            move_category_closure(cursor, category_id, request_data['parent_id'])
+            # Les budgets des anciens et nouveaux ancêtres changent de périmètre
+            rebuild_budget_spending(cursor, category['cat_usr_id'])
+
         cursor.execute("""
             SELECT cat_id as id, cat_usr_id as user_id, cat_parent_id as parent_id,
                    cat_name as name, cat_type as type, cat_icon as icon,
@@ -138,10 +163,11 @@ async def update_category(category_id: str, request: CategoryUpdate):
 
 
 @router.delete("/{category_id}")
-async def delete_category(category_id: str):
+def delete_category(category_id: str, current_user: dict = Depends(get_current_user)):
     """Delete a category. Children become orphans (parent_id = NULL)."""
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT cat_id FROM mm_categories WHERE cat_id = %s", (category_id,))
+        cursor.execute("SELECT cat_id, cat_usr_id FROM mm_categories WHERE cat_id = %s AND cat_usr_id = %s",
+                       (category_id, current_user['id']))
         category = cursor.fetchone()
         if not category:
             raise HTTPException(status_code=404, detail="Catégorie non trouvée")
@@ -150,15 +176,19 @@ async def delete_category(category_id: str):
         # Mettre à jour les transactions et récurrentes
         cursor.execute("UPDATE mm_transactions SET trx_cat_id = NULL WHERE trx_cat_id = %s", (category_id,))
         cursor.execute("UPDATE mm_recurring SET rec_cat_id = NULL WHERE rec_cat_id = %s", (category_id,))
+        uncategorize_category(cursor, category_id)
+        remove_category_closure(cursor, category_id)
         cursor.execute("DELETE FROM mm_categories WHERE cat_id = %s", (category_id,))
+        rebuild_budget_spending(cursor, category['cat_usr_id'])
 
     return {"message": "Catégorie supprimée"}
 
 
 @router.get("/{category_id}/children")
-async def get_category_children(category_id: str):
+def get_category_children(category_id: str, current_user: dict = Depends(get_current_user)):
     """Get all direct children of a category."""
     with get_db() as (conn, cursor):
+        ensure_owner(cursor, 'category', category_id, current_user)
         cursor.execute("""
             SELECT cat_id as id, cat_usr_id as user_id, cat_parent_id as parent_id,
                    cat_name as name, cat_type as type, cat_icon as icon,
@@ -172,47 +202,33 @@ async def get_category_children(category_id: str):
 
 
 @router.get("/{category_id}/descendants")
-async def get_category_descendants(category_id: str):
+def get_category_descendants(category_id: str, current_user: dict = Depends(get_current_user)):
     """Get all descendants (children, grandchildren, etc.) of a category recursively."""
     with get_db() as (conn, cursor):
-        # Requête récursive avec CTE pour obtenir tous les descendants
+        ensure_owner(cursor, 'category', category_id, current_user)
+        # Table de fermeture : une ligne par (ancêtre, descendant), level 0 = enfants directs
         cursor.execute("""
-            WITH RECURSIVE descendants AS (
-                SELECT cat_id, cat_usr_id, cat_parent_id, cat_name, cat_type,
-                       cat_icon, cat_color, cat_is_default, 0 as level
-                FROM mm_categories
-                WHERE cat_parent_id = %s
-
-                UNION ALL
-
-                SELECT c.cat_id, c.cat_usr_id, c.cat_parent_id, c.cat_name, c.cat_type,
-                       c.cat_icon, c.cat_color, c.cat_is_default, d.level + 1
-                FROM mm_categories c
-                INNER JOIN descendants d ON c.cat_parent_id = d.cat_id
-            )
-            SELECT cat_id as id, cat_usr_id as user_id, cat_parent_id as parent_id,
-                   cat_name as name, cat_type as type, cat_icon as icon,
-                   cat_color as color, cat_is_default as is_default, level
-            FROM descendants
-            ORDER BY level, cat_name
+            SELECT c.cat_id as id, c.cat_usr_id as user_id, c.cat_parent_id as parent_id,
+                   c.cat_name as name, c.cat_type as type, c.cat_icon as icon,
+                   c.cat_color as color, c.cat_is_default as is_default,
+                   cc.clo_depth - 1 as level
+            FROM mm_category_closure cc
+            INNER JOIN mm_categories c ON c.cat_id = cc.clo_descendant_id
+            WHERE cc.clo_ancestor_id = %s AND cc.clo_depth > 0
+            ORDER BY level, c.cat_name
         """, (category_id,))
         descendants = cursor.fetchall()
     return {"descendants": descendants}
 
 
 @router.post("/reset")
-async def reset_categories(user_id: str):
+def reset_categories(user_id: str):
     """
     Reset user's categories to default.
     Deletes all existing categories and recreates the default ones.
     Warning: This will also unlink all transactions and recurring from their categories.
     """
     with get_db() as (conn, cursor):
-        # Vérifier que l'utilisateur existe
-        cursor.execute("SELECT usr_id FROM mm_users WHERE usr_id = %s", (user_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-
         # Supprimer les budgets liés aux catégories de l'utilisateur
         cursor.execute("""
             DELETE FROM mm_budgets WHERE bgt_usr_id = %s
@@ -229,12 +245,13 @@ async def reset_categories(user_id: str):
         cursor.execute("""
             UPDATE mm_recurring SET rec_cat_id = NULL WHERE rec_usr_id = %s
         """, (user_id,))
+        rebuild_monthly_aggregates(cursor, user_id)
 
         # Supprimer toutes les catégories de l'utilisateur
         cursor.execute("DELETE FROM mm_categories WHERE cat_usr_id = %s", (user_id,))
 
-        # Appeler la procédure pour créer les catégories par défaut
-        cursor.callproc('create_default_categories_for_user', (user_id,))
+        # Recréer les catégories par défaut (mêmes que pour un nouvel inscrit)
+        provision_default_categories(cursor, user_id)
 
         # Récupérer les nouvelles catégories
         cursor.execute("""
@@ -2,31 +2,17 @@
 Routes pour la gestion des icônes.
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from pathlib import Path
-import uuid
+from fastapi import APIRouter, Request
 
-from app.database import get_db
+from app.services.http_cache import conditional_json
+from app.services.icons import default_icons
+from app.responses import FastJSONRoute
 
-router = APIRouter(prefix="/icons", tags=["Icônes"])
-
-# Chemin vers le dossier frontend/public
-FRONTEND_PUBLIC_PATH = Path(__file__).parent.parent.parent.parent / "frontend" / "public"
-ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+router = APIRouter(prefix="/icons", tags=["Icônes"], route_class=FastJSONRoute)
 
 
 @router.get("/default")
-async def get_default_icons():
-    """Récupère la liste des icônes par défaut."""
-    icons_path = FRONTEND_PUBLIC_PATH / "default" / "icons"
-    icons = []
-
-    if icons_path.exists():
-        for file in icons_path.iterdir():
-            if file.suffix.lower() in ALLOWED_EXTENSIONS:
-                icons.append({
-                    "name": file.stem,
-                    "path": f"/default/icons/{file.name}"
-                })
-
-    return {"icons": sorted(icons, key=lambda x: x['name'])}
+def get_default_icons(request: Request):
+    """Récupère la liste des icônes par défaut (catalogue en mémoire, ETag)."""
+    icons, etag = default_icons.get()
+    return conditional_json(request, {"icons": icons}, "public, max-age=300", etag=etag)
@@ -2,17 +2,19 @@
 Recurring transaction management routes.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 import uuid
 
+from app.auth import ensure_owner, ensure_same_user, get_current_user
 from app.database import get_db
 from app.models.recurring import RecurringCreate, RecurringUpdate
+from app.responses import FastJSONRoute
 
-router = APIRouter(prefix="/recurring", tags=["Recurring Transactions"])
+router = APIRouter(prefix="/recurring", tags=["Recurring Transactions"], route_class=FastJSONRoute)
 
 
 @router.get("/{recurring_id}")
-async def get_recurring_transaction(recurring_id: str):
+def get_recurring_transaction(recurring_id: str, current_user: dict = Depends(get_current_user)):
     """Get a recurring transaction by ID."""
     with get_db() as (conn, cursor):
         cursor.execute("""
@@ -27,8 +29,8 @@ async def get_recurring_transaction(recurring_id: str):
             FROM mm_recurring r
             LEFT JOIN mm_categories c ON r.rec_cat_id = c.cat_id
             JOIN mm_accounts a ON r.rec_acc_id = a.acc_id
-            WHERE r.rec_id = %s
-        """, (recurring_id,))
+            WHERE r.rec_id = %s AND r.rec_usr_id = %s
+        """, (recurring_id, current_user['id']))
         recurring = cursor.fetchone()
 
     if not recurring:
@@ -37,12 +39,13 @@ async def get_recurring_transaction(recurring_id: str):
 
 
 @router.post("")
-async def create_recurring_transaction(request: RecurringCreate):
+def create_recurring_transaction(request: RecurringCreate, current_user: dict = Depends(get_current_user)):
     """Create a new recurring transaction."""
+    ensure_same_user(request.user_id, current_user)
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT acc_id FROM mm_accounts WHERE acc_id = %s", (request.account_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Compte non trouvé")
+        ensure_owner(cursor, 'account', request.account_id, current_user)
+        if request.category_id:
+            ensure_owner(cursor, 'category', request.category_id, current_user)
 
         recurring_id = str(uuid.uuid4())
         cursor.execute("""
@@ -75,12 +78,15 @@ async def create_recurring_transaction(request: RecurringCreate):
 
 
 @router.put("/{recurring_id}")
-async def update_recurring_transaction(recurring_id: str, request: RecurringUpdate):
+def update_recurring_transaction(recurring_id: str, request: RecurringUpdate,
+                                 current_user: dict = Depends(get_current_user)):
     """Update a recurring transaction."""
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT rec_id FROM mm_recurring WHERE rec_id = %s", (recurring_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Transaction récurrente non trouvée")
+        ensure_owner(cursor, 'recurring', recurring_id, current_user)
+        if request.account_id:
+            ensure_owner(cursor, 'account', request.account_id, current_user)
+        if request.category_id:
+            ensure_owner(cursor, 'category', request.category_id, current_user)
 
         field_mapping = {
             'account_id': 'rec_acc_id',
@@ -132,12 +138,10 @@ async def update_recurring_transaction(recurring_id: str, request: RecurringUpda
 
 
 @router.delete("/{recurring_id}")
-async def delete_recurring_transaction(recurring_id: str):
+def delete_recurring_transaction(recurring_id: str, current_user: dict = Depends(get_current_user)):
     """Delete a recurring transaction."""
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT rec_id FROM mm_recurring WHERE rec_id = %s", (recurring_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Transaction récurrente non trouvée")
+        ensure_owner(cursor, 'recurring', recurring_id, current_user)
 
         cursor.execute("DELETE FROM mm_recurring WHERE rec_id = %s", (recurring_id,))
 
@@ -2,18 +2,22 @@
 Transaction management routes.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from datetime import date
 import uuid
 
+from app.auth import ensure_owner, get_current_user
 from app.database import get_db
-from app.models.transaction import TransactionCreate, TransactionUpdate
+from app.models.transaction import TransactionCreate, TransactionUpdate, TransactionBatchCreate
+from app.services.aggregates import record_transactions
+from app.services.transactions import validate_transactions, insert_transactions
+from app.responses import FastJSONRoute
 
-router = APIRouter(prefix="/transactions", tags=["Transactions"])
+router = APIRouter(prefix="/transactions", tags=["Transactions"], route_class=FastJSONRoute)
 
 
 @router.get("/{transaction_id}")
-async def get_transaction(transaction_id: str):
+def get_transaction(transaction_id: str, current_user: dict = Depends(get_current_user)):
     """Get a transaction by ID."""
     with get_db() as (conn, cursor):
         cursor.execute("""
@@ -22,9 +26,10 @@ async def get_transaction(transaction_id: str):
                    t.trx_amount as amount, t.trx_description as description, t.trx_date as date,
                    t.created_at, c.cat_name as category_name, c.cat_icon as category_icon
             FROM mm_transactions t
+            JOIN mm_accounts a ON t.trx_acc_id = a.acc_id
             LEFT JOIN mm_categories c ON t.trx_cat_id = c.cat_id
-            WHERE t.trx_id = %s
-        """, (transaction_id,))
+            WHERE t.trx_id = %s AND a.acc_usr_id = %s
+        """, (transaction_id, current_user['id']))
         transaction = cursor.fetchone()
 
     if not transaction:
@@ -33,22 +38,20 @@ async def get_transaction(transaction_id: str):
 
 
 @router.post("")
-async def create_transaction(request: TransactionCreate):
+def create_transaction(request: TransactionCreate, current_user: dict = Depends(get_current_user)):
     """Create a new transaction and update account balance."""
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT acc_id, acc_balance FROM mm_accounts WHERE acc_id = %s", (request.account_id,))
-        account = cursor.fetchone()
-        if not account:
-            raise HTTPException(status_code=404, detail="Compte source non trouvé")
+        ensure_owner(cursor, 'account', request.account_id, current_user, "Compte source non trouvé")
 
         if request.type == 'transfer':
             if not request.target_account_id:
                 raise HTTPException(status_code=400, detail="Le compte destinataire est requis pour un transfert")
             if request.target_account_id == request.account_id:
                 raise HTTPException(status_code=400, detail="Le compte destinataire doit être différent du compte source")
-            cursor.execute("SELECT acc_id FROM mm_accounts WHERE acc_id = %s", (request.target_account_id,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=404, detail="Compte destinataire non trouvé")
+            ensure_owner(cursor, 'account', request.target_account_id, current_user,
+                         "Compte destinataire non trouvé")
+        if request.category_id:
+            ensure_owner(cursor, 'category', request.category_id, current_user)
 
         transaction_id = str(uuid.uuid4())
         cursor.execute("""
@@ -70,6 +73,8 @@ async def create_transaction(request: TransactionCreate):
             cursor.execute("UPDATE mm_accounts SET acc_balance = acc_balance + %s WHERE acc_id = %s",
                            (request.amount, request.target_account_id))
 
+        record_transactions(cursor, [request.model_dump()])
+
         cursor.execute("""
             SELECT t.trx_id as id, t.trx_acc_id as account_id, t.trx_target_acc_id as target_account_id,
                    t.trx_cat_id as category_id, t.trx_type as type, t.trx_amount as amount,
@@ -84,12 +89,57 @@ async def create_transaction(request: TransactionCreate):
     return {"transaction": transaction}
 
 
+@router.post("/batch")
+def create_transactions_batch(request: TransactionBatchCreate, current_user: dict = Depends(get_current_user)):
+    """
+    Create many transactions in one DB transaction (bank history import).
+
+    Returns one result per item, in order. Without allow_partial, any invalid
+    item rejects the whole batch (400, nothing is written); with it, valid
+    items are created and invalid ones are reported.
+    """
+    items = [trx.model_dump() for trx in request.transactions]
+
+    with get_db() as (conn, cursor):
+        errors = validate_transactions(cursor, items, current_user['id'])
+        failed = sum(1 for error in errors if error)
+        if failed and not request.allow_partial:
+            raise HTTPException(status_code=400, detail={
+                "message": f"{failed} transaction(s) invalide(s), aucune transaction créée",
+                "results": [
+                    {"index": index, "status": "error", "error": error}
+                    for index, error in enumerate(errors) if error
+                ]
+            })
+
+        valid = [index for index, error in enumerate(errors) if not error]
+        ids = insert_transactions(cursor, [items[index] for index in valid])
+
+    created = dict(zip(valid, ids))
+    results = [
+        {"index": index, "status": "created", "id": created[index]} if index in created
+        else {"index": index, "status": "error", "error": errors[index]}
+        for index in range(len(items))
+    ]
+    return {"created": len(ids), "failed": failed, "results": results}
+
+
 @router.put("/{transaction_id}")
-async def update_transaction(transaction_id: str, request: TransactionUpdate):
+def update_transaction(transaction_id: str, request: TransactionUpdate,
+                       current_user: dict = Depends(get_current_user)):
     """Update a transaction (without recalculating balance for simplicity)."""
     with get_db() as (conn, cursor):
-        cursor.execute("SELECT trx_id FROM mm_transactions WHERE trx_id = %s", (transaction_id,))
-        if not cursor.fetchone():
+        ensure_owner(cursor, 'transaction', transaction_id, current_user)
+        if request.category_id:
+            ensure_owner(cursor, 'category', request.category_id, current_user)
+
+        cursor.execute("""
+            SELECT trx_acc_id as account_id, trx_cat_id as category_id, trx_type as type,
+                   trx_amount as amount, trx_date as date
+            FROM mm_transactions WHERE trx_id = %s
+        """, (transaction_id,))
+        previous = cursor.fetchone()
+        if not previous:
             raise HTTPException(status_code=404, detail="Transaction non trouvée")
 
         field_mapping = {
@@ -126,15 +176,20 @@ async def update_transaction(transaction_id: str, request: TransactionUpdate):
         """, (transaction_id,))
         transaction = cursor.fetchone()
 
+        if updates:
+            record_transactions(cursor, [previous], sign=-1)
+            record_transactions(cursor, [transaction])
+
     return {"transaction": transaction}
 
 
 @router.delete("/{transaction_id}")
-async def delete_transaction(transaction_id: str):
+def delete_transaction(transaction_id: str, current_user: dict = Depends(get_current_user)):
     """Delete a transaction and reverse the balance effect."""
     with get_db() as (conn, cursor):
+        ensure_owner(cursor, 'transaction', transaction_id, current_user)
         cursor.execute("""
-            SELECT trx_id, trx_acc_id, trx_target_acc_id, trx_type, trx_amount
+            SELECT trx_id, trx_acc_id, trx_target_acc_id, trx_cat_id, trx_type, trx_amount, trx_date
             FROM mm_transactions WHERE trx_id = %s
         """, (transaction_id,))
         transaction = cursor.fetchone()
@@ -154,5 +209,12 @@ async def delete_transaction(transaction_id: str):
                            (transaction['trx_amount'], transaction['trx_target_acc_id']))
 
         cursor.execute("DELETE FROM mm_transactions WHERE trx_id = %s", (transaction_id,))
+        record_transactions(cursor, [{
+            'account_id': transaction['trx_acc_id'],
+            'category_id': transaction['trx_cat_id'],
+            'type': transaction['trx_type'],
+            'amount': transaction['trx_amount'],
+            'date': transaction['trx_date'],
+        }], sign=-1)
 
     return {"message": "Transaction supprimée"}
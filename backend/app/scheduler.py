@@ -0,0 +1,105 @@
+"""
+Planificateur des transactions récurrentes.
+
+Un thread de fond parcourt périodiquement les récurrences dues de tous les
+utilisateurs (index idx_rec_due), par pages de RECURRING_BATCH_SIZE, et les
+traite en parallèle sur RECURRING_WORKERS threads : chaque page est traitée
+dans sa propre transaction SQL.
+
+Utilisation ponctuelle (cron, maintenance):
+    python -m app.scheduler
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from app.config import get_settings
+from app.database import get_db
+from app.services.recurring import find_due_recurring, process_recurring
+
+logger = logging.getLogger(__name__)
+
+
+def process_due_batch(recurring_ids, today: date) -> int:
+    """Traite une page de récurrences dans une transaction. Retourne le nombre de transactions créées."""
+    with get_db() as (conn, cursor):
+        return len(process_recurring(cursor, recurring_ids, today))
+
+
+def run_once(batch_size: int, workers: int, today: date = None) -> dict:
+    """
+    Parcourt toutes les récurrences dues (pagination par clé sur
+    (rec_next_occurrence, rec_id)) et les traite. Une page en échec est
+    annulée et journalisée sans interrompre les suivantes.
+    """
+    today = today or date.today()
+    stats = {"batches": 0, "created": 0, "failed_batches": 0}
+
+    futures = []
+    after = None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recurring") as executor:
+        while True:
+            with get_db() as (conn, cursor):
+                due = find_due_recurring(cursor, today, after=after, limit=batch_size)
+            if not due:
+                break
+            after = (due[-1]['rec_next_occurrence'], due[-1]['rec_id'])
+            futures.append(executor.submit(process_due_batch, [row['rec_id'] for row in due], today))
+
+    for future in futures:
+        try:
+            stats["created"] += future.result()
+            stats["batches"] += 1
+        except Exception:
+            stats["failed_batches"] += 1
+            logger.exception("Échec du traitement d'un lot de récurrences")
+    return stats
+
+
+class RecurringScheduler:
+    """Exécute run_once au démarrage puis toutes les interval secondes."""
+
+    def __init__(self, interval: float, batch_size: int, workers: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.workers = workers
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="recurring-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                stats = run_once(self.batch_size, self.workers)
+                if stats["created"] or stats["failed_batches"]:
+                    logger.info("Récurrences traitées: %s", stats)
+            except Exception:
+                logger.exception("Échec du passage du planificateur de récurrences")
+            self._stop.wait(self.interval)
+
+
+settings = get_settings()
+
+scheduler = RecurringScheduler(
+    interval=settings.RECURRING_SCHEDULER_INTERVAL,
+    batch_size=settings.RECURRING_BATCH_SIZE,
+    workers=settings.RECURRING_WORKERS,
+)
+
+
+if __name__ == "__main__":
+    print(f"Récurrences traitées: {run_once(settings.RECURRING_BATCH_SIZE, settings.RECURRING_WORKERS)}")
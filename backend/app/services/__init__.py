@@ -0,0 +1,3 @@
+"""
+Services métier partagés entre les routes (agrégations, calculs).
+"""
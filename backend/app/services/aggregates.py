@@ -0,0 +1,103 @@
+"""
+Monthly aggregates (account x category x month x type) kept in sync with
+mm_transactions.
+
+Every code path that writes transactions applies the same rows here, in
+the same DB transaction, so that dashboards and budgets read a few rows
+per month instead of scanning mm_transactions. Expense rows are also
+forwarded to the budget spending counters.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from app.services.budgets import record_budget_spending
+
+# mag_cat_id fait partie de la clé primaire : les transactions sans
+# catégorie sont regroupées sous une chaîne vide plutôt que NULL
+UNCATEGORIZED = ''
+
+
+def month_start(value) -> date:
+    """Premier jour du mois d'une date (objet date ou chaîne 'YYYY-MM-DD')."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.replace(day=1)
+
+
+def record_transactions(cursor, transactions, sign: int = 1):
+    """
+    Applies transactions to the aggregates, or removes them with sign=-1.
+
+    Each transaction is a mapping with the API field names:
+    account_id, category_id, type, amount, date.
+    """
+    deltas = {}
+    for trx in transactions:
+        key = (
+            trx['account_id'],
+            trx['category_id'] or UNCATEGORIZED,
+            month_start(trx['date']),
+            trx['type'],
+        )
+        total, count = deltas.get(key, (Decimal(0), 0))
+        deltas[key] = (total + sign * Decimal(str(trx['amount'])), count + sign)
+
+    if not deltas:
+        return
+
+    # executemany regroupe les lignes en un seul INSERT multi-valeurs
+    cursor.executemany("""
+        INSERT INTO mm_monthly_aggregates (mag_acc_id, mag_cat_id, mag_month, mag_type, mag_total, mag_count)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE mag_total = mag_total + VALUES(mag_total),
+                                mag_count = mag_count + VALUES(mag_count)
+    """, [key + value for key, value in deltas.items()])
+
+    record_budget_spending(cursor, [
+        (account_id, category_id, month, total)
+        for (account_id, category_id, month, trx_type), (total, count) in deltas.items()
+        if trx_type == 'expense' and category_id != UNCATEGORIZED
+    ])
+
+
+def uncategorize_category(cursor, category_id: str):
+    """Moves the aggregates of a deleted category to the uncategorized bucket."""
+    cursor.execute("""
+        INSERT INTO mm_monthly_aggregates (mag_acc_id, mag_cat_id, mag_month, mag_type, mag_total, mag_count)
+        SELECT mag_acc_id, %s, mag_month, mag_type, mag_total, mag_count
+        FROM mm_monthly_aggregates WHERE mag_cat_id = %s
+        ON DUPLICATE KEY UPDATE mag_total = mm_monthly_aggregates.mag_total + VALUES(mag_total),
+                                mag_count = mm_monthly_aggregates.mag_count + VALUES(mag_count)
+    """, (UNCATEGORIZED, category_id))
+    cursor.execute("DELETE FROM mm_monthly_aggregates WHERE mag_cat_id = %s", (category_id,))
+
+
+def rebuild_monthly_aggregates(cursor, user_id: str = None) -> int:
+    """
+    Recomputes the aggregates from mm_transactions, for one user or for
+    everyone. Returns the number of aggregate rows written.
+    """
+    user_filter = ""
+    params = ()
+    if user_id:
+        user_filter = "WHERE t.trx_acc_id IN (SELECT acc_id FROM mm_accounts WHERE acc_usr_id = %s)"
+        params = (user_id,)
+        cursor.execute("""
+            DELETE FROM mm_monthly_aggregates
+            WHERE mag_acc_id IN (SELECT acc_id FROM mm_accounts WHERE acc_usr_id = %s)
+        """, params)
+    else:
+        cursor.execute("DELETE FROM mm_monthly_aggregates")
+
+    cursor.execute(f"""
+        INSERT INTO mm_monthly_aggregates (mag_acc_id, mag_cat_id, mag_month, mag_type, mag_total, mag_count)
+        SELECT t.trx_acc_id, COALESCE(t.trx_cat_id, ''),
+               t.trx_date - INTERVAL (DAY(t.trx_date) - 1) DAY,
+               t.trx_type, SUM(t.trx_amount), COUNT(*)
+        FROM mm_transactions t
+        {user_filter}
+        GROUP BY t.trx_acc_id, COALESCE(t.trx_cat_id, ''),
+                 t.trx_date - INTERVAL (DAY(t.trx_date) - 1) DAY, t.trx_type
+    """, params)
+    return cursor.rowcount
@@ -0,0 +1,167 @@
+"""
+Budget spending computation.
+
+Spending for all the budgets of a user is computed in one pass: every
+budget category subtree is expanded with a single closure-table join, the
+month's expenses are read once grouped by category, and the totals are
+rolled up in memory. The number of queries does not depend on the number
+of budgets.
+
+The budget check on the expense entry path reads mm_budget_spending
+instead: running per-budget, per-month totals updated alongside the
+monthly aggregates on every transaction write.
+"""
+
+from decimal import Decimal
+
+
+def expand_category_subtrees(cursor, category_ids) -> dict:
+    """Returns {category_id: [category_id and all its descendants]}."""
+    category_ids = list(dict.fromkeys(category_ids))
+    if not category_ids:
+        return {}
+
+    placeholders = ','.join(['%s'] * len(category_ids))
+    cursor.execute(f"""
+        SELECT clo_ancestor_id as root_id, clo_descendant_id as cat_id
+        FROM mm_category_closure
+        WHERE clo_ancestor_id IN ({placeholders})
+    """, category_ids)
+
+    subtrees = {category_id: [] for category_id in category_ids}
+    for row in cursor.fetchall():
+        subtrees[row['root_id']].append(row['cat_id'])
+    return subtrees
+
+
+def fetch_monthly_expenses_by_category(cursor, user_id: str, month) -> dict:
+    """Returns {category_id: Decimal} of a user's expenses for one month."""
+    cursor.execute("""
+        SELECT m.mag_cat_id as category_id, SUM(m.mag_total) as total
+        FROM mm_monthly_aggregates m
+        JOIN mm_accounts a ON m.mag_acc_id = a.acc_id
+        WHERE a.acc_usr_id = %s
+          AND m.mag_type = 'expense'
+          AND m.mag_month = %s
+        GROUP BY m.mag_cat_id
+    """, (user_id, month))
+    return {row['category_id']: row['total'] for row in cursor.fetchall()}
+
+
+def compute_budget_spending(cursor, user_id: str, category_ids, month) -> dict:
+    """
+    Returns {category_id: spent} where spent covers the category and all
+    its subcategories for the given month (first day of the month).
+    """
+    subtrees = expand_category_subtrees(cursor, category_ids)
+    if not subtrees:
+        return {}
+    expenses = fetch_monthly_expenses_by_category(cursor, user_id, month)
+
+    return {
+        root_id: float(sum((expenses.get(cat_id, Decimal(0)) for cat_id in subtree), Decimal(0)))
+        for root_id, subtree in subtrees.items()
+    }
+
+
+def list_budgets_with_spending(cursor, user_id: str, month) -> list:
+    """Budgets of a user with their spending for the given month."""
+    cursor.execute("""
+        SELECT b.bgt_id as id, b.bgt_cat_id as category_id, b.bgt_parent_id as parent_budget_id,
+               b.bgt_amount as budget_amount, b.bgt_display_order as display_order,
+               c.cat_name as category_name, c.cat_icon as category_icon, c.cat_color as category_color
+        FROM mm_budgets b
+        JOIN mm_categories c ON b.bgt_cat_id = c.cat_id
+        WHERE b.bgt_usr_id = %s
+        ORDER BY b.bgt_parent_id IS NOT NULL,
+                 CASE WHEN b.bgt_display_order IS NULL THEN 1 ELSE 0 END,
+                 b.bgt_display_order ASC, b.created_at ASC
+    """, (user_id,))
+    budgets = cursor.fetchall()
+
+    spending = compute_budget_spending(cursor, user_id, [b['category_id'] for b in budgets], month)
+
+    result = []
+    for budget in budgets:
+        spent = spending.get(budget['category_id'], 0)
+
+        budget_amount = float(budget['budget_amount'])
+        remaining = budget_amount - spent
+        percentage = (spent / budget_amount * 100) if budget_amount > 0 else 0
+
+        result.append({
+            'id': budget['id'],
+            'category_id': budget['category_id'],
+            'category_name': budget['category_name'],
+            'category_icon': budget['category_icon'],
+            'category_color': budget['category_color'],
+            'parent_budget_id': budget['parent_budget_id'],
+            'budget_amount': budget_amount,
+            'spent': spent,
+            'remaining': remaining,
+            'percentage': min(percentage, 100),
+            'is_exceeded': spent > budget_amount,
+            'display_order': budget['display_order']
+        })
+
+    return result
+
+
+def record_budget_spending(cursor, deltas):
+    """
+    Applies expense deltas to the spending counters of every budget set on
+    the category or one of its ancestors.
+
+    Each delta is an (account_id, category_id, month, amount) tuple.
+    """
+    if not deltas:
+        return
+
+    rows = ' UNION ALL '.join(['SELECT %s as acc_id, %s as cat_id, %s as month, %s as amount'] * len(deltas))
+    params = [value for delta in deltas for value in delta]
+    cursor.execute(f"""
+        INSERT INTO mm_budget_spending (bsp_bgt_id, bsp_month, bsp_spent)
+        SELECT b.bgt_id, d.month, SUM(d.amount)
+        FROM ({rows}) d
+        JOIN mm_category_closure cc ON cc.clo_descendant_id = d.cat_id
+        JOIN mm_budgets b ON b.bgt_cat_id = cc.clo_ancestor_id
+        JOIN mm_accounts a ON a.acc_id = d.acc_id AND a.acc_usr_id = b.bgt_usr_id
+        GROUP BY b.bgt_id, d.month
+        ON DUPLICATE KEY UPDATE bsp_spent = bsp_spent + VALUES(bsp_spent)
+    """, params)
+
+
+def rebuild_budget_spending(cursor, user_id: str = None, budget_ids=None) -> int:
+    """
+    Recomputes the spending counters from the monthly aggregates, for some
+    budgets, one user or everyone. Returns the number of counter rows written.
+    """
+    if budget_ids is not None:
+        budget_ids = list(budget_ids)
+        if not budget_ids:
+            return 0
+        budget_filter = f"b.bgt_id IN ({','.join(['%s'] * len(budget_ids))})"
+        params = budget_ids
+    elif user_id:
+        budget_filter = "b.bgt_usr_id = %s"
+        params = [user_id]
+    else:
+        budget_filter = "1 = 1"
+        params = []
+
+    cursor.execute(f"""
+        DELETE s FROM mm_budget_spending s
+        JOIN mm_budgets b ON s.bsp_bgt_id = b.bgt_id
+        WHERE {budget_filter}
+    """, params)
+    cursor.execute(f"""
+        INSERT INTO mm_budget_spending (bsp_bgt_id, bsp_month, bsp_spent)
+        SELECT b.bgt_id, m.mag_month, SUM(m.mag_total)
+        FROM mm_budgets b
+        JOIN mm_category_closure cc ON cc.clo_ancestor_id = b.bgt_cat_id
+        JOIN mm_monthly_aggregates m ON m.mag_cat_id = cc.clo_descendant_id AND m.mag_type = 'expense'
+        JOIN mm_accounts a ON a.acc_id = m.mag_acc_id AND a.acc_usr_id = b.bgt_usr_id
+        WHERE {budget_filter}
+        GROUP BY b.bgt_id, m.mag_month
+    """, params)
+    return cursor.rowcount
@@ -0,0 +1,143 @@
+"""
+Category closure table (mm_category_closure) maintenance.
+
+Every category has one row per ancestor, itself included (depth 0), so
+subtree and ancestor lookups are indexed joins instead of recursive CTEs.
+"""
+
+
+def closure_rows(categories) -> list:
+    """
+    Computes the closure rows of new categories given as (cat_id, parent_id)
+    pairs, parents listed before their children. Parents that are not in
+    the list are treated as roots.
+    """
+    ancestors = {}
+    rows = []
+    for cat_id, parent_id in categories:
+        chain = [cat_id] + ancestors.get(parent_id, [])
+        ancestors[cat_id] = chain
+        rows.extend((ancestor_id, cat_id, depth) for depth, ancestor_id in enumerate(chain))
+    return rows
+
+
+def insert_closure_rows(cursor, rows):
+    """Inserts precomputed (ancestor, descendant, depth) rows in one statement."""
+    if rows:
+        cursor.executemany("""
+            INSERT INTO mm_category_closure (clo_ancestor_id, clo_descendant_id, clo_depth)
+            VALUES (%s, %s, %s)
+        """, rows)
+
+
+def insert_category_closure(cursor, category_id: str, parent_id: str = None):
+    """Adds a new leaf category under parent_id (or as a root)."""
+    cursor.execute("""
+        INSERT INTO mm_category_closure (clo_ancestor_id, clo_descendant_id, clo_depth)
+        SELECT clo_ancestor_id, %s, clo_depth + 1
+        FROM mm_category_closure WHERE clo_descendant_id = %s
+        UNION ALL
+        SELECT %s, %s, 0
+    """, (category_id, parent_id, category_id, category_id))
+
+
+def is_descendant(cursor, category_id: str, ancestor_id: str) -> bool:
+    """True if category_id is ancestor_id or one of its descendants."""
+    cursor.execute("""
+        SELECT 1 FROM mm_category_closure
+        WHERE clo_ancestor_id = %s AND clo_descendant_id = %s
+    """, (ancestor_id, category_id))
+    return cursor.fetchone() is not None
+
+
+def _unlink(cursor, ancestor_ids, descendant_ids):
+    if not ancestor_ids or not descendant_ids:
+        return
+    anc = ','.join(['%s'] * len(ancestor_ids))
+    desc = ','.join(['%s'] * len(descendant_ids))
+    cursor.execute(f"""
+        DELETE FROM mm_category_closure
+        WHERE clo_ancestor_id IN ({anc}) AND clo_descendant_id IN ({desc})
+    """, list(ancestor_ids) + list(descendant_ids))
+
+
+def _ancestors(cursor, category_id: str, include_self: bool) -> list:
+    cursor.execute("""
+        SELECT clo_ancestor_id FROM mm_category_closure
+        WHERE clo_descendant_id = %s AND clo_depth >= %s
+    """, (category_id, 0 if include_self else 1))
+    return [row['clo_ancestor_id'] for row in cursor.fetchall()]
+
+
+def _descendants(cursor, category_id: str, include_self: bool) -> list:
+    cursor.execute("""
+        SELECT clo_descendant_id FROM mm_category_closure
+        WHERE clo_ancestor_id = %s AND clo_depth >= %s
+    """, (category_id, 0 if include_self else 1))
+    return [row['clo_descendant_id'] for row in cursor.fetchall()]
+
+
+def move_category_closure(cursor, category_id: str, new_parent_id: str = None):
+    """Re-parents a category and its whole subtree under new_parent_id."""
+    _unlink(
+        cursor,
+        _ancestors(cursor, category_id, include_self=False),
+        _descendants(cursor, category_id, include_self=True),
+    )
+    if new_parent_id:
+        cursor.execute("""
+            INSERT INTO mm_category_closure (clo_ancestor_id, clo_descendant_id, clo_depth)
+            SELECT p.clo_ancestor_id, s.clo_descendant_id, p.clo_depth + s.clo_depth + 1
+            FROM mm_category_closure p
+            CROSS JOIN mm_category_closure s
+            WHERE p.clo_descendant_id = %s AND s.clo_ancestor_id = %s
+        """, (new_parent_id, category_id))
+
+
+def remove_category_closure(cursor, category_id: str):
+    """
+    Removes a category from the closure before it is deleted. Its children
+    become roots (cat_parent_id is set to NULL by the foreign key).
+    """
+    _unlink(
+        cursor,
+        _ancestors(cursor, category_id, include_self=True),
+        _descendants(cursor, category_id, include_self=False),
+    )
+    cursor.execute("""
+        DELETE FROM mm_category_closure
+        WHERE clo_ancestor_id = %s OR clo_descendant_id = %s
+    """, (category_id, category_id))
+
+
+def rebuild_category_closure(cursor, user_id: str = None) -> int:
+    """
+    Recomputes the closure from cat_parent_id, for one user or for
+    everyone. Returns the number of closure rows written.
+    """
+    user_filter = ""
+    params = ()
+    if user_id:
+        user_filter = "WHERE cat_usr_id = %s"
+        params = (user_id,)
+        cursor.execute("""
+            DELETE cc FROM mm_category_closure cc
+            JOIN mm_categories c ON cc.clo_descendant_id = c.cat_id
+            WHERE c.cat_usr_id = %s
+        """, params)
+    else:
+        cursor.execute("DELETE FROM mm_category_closure")
+
+    cursor.execute(f"""
+        INSERT INTO mm_category_closure (clo_ancestor_id, clo_descendant_id, clo_depth)
+        WITH RECURSIVE tree AS (
+            SELECT cat_id as ancestor_id, cat_id as descendant_id, 0 as depth
+            FROM mm_categories {user_filter}
+            UNION ALL
+            SELECT t.ancestor_id, c.cat_id, t.depth + 1
+            FROM mm_categories c
+            INNER JOIN tree t ON c.cat_parent_id = t.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+    """, params)
+    return cursor.rowcount
@@ -0,0 +1,148 @@
+"""
+Default categories created for every new user (registration and reset).
+
+The template is flattened once at import time: categories are numbered,
+parents first, and their closure rows are computed on the indexes.
+Provisioning a user only draws fresh UUIDs and writes the parents, the
+children and the closure rows with one multi-row INSERT each.
+"""
+
+import uuid
+
+from app.services.categories import closure_rows, insert_closure_rows
+
+# Catégories par défaut avec hiérarchie
+DEFAULT_CATEGORIES = {
+    "expense": {
+        "Alimentation": {
+            "icon": "/default/icons/cart.png",
+            "color": "#ef4444",
+            "children": ["Courses", "Restaurants", "Fast-food", "Livraison"]
+        },
+        "Transport": {
+            "icon": "/default/icons/car.png",
+            "color": "#f59e0b",
+            "children": ["Carburant", "Transports en commun", "Taxi/VTC", "Entretien véhicule"]
+        },
+        "Logement": {
+            "icon": "/default/icons/home.png",
+            "color": "#eab308",
+            "children": ["Loyer", "Charges", "Assurance habitation", "Travaux"]
+        },
+        "Santé": {
+            "icon": "/default/icons/pill.png",
+            "color": "#22c55e",
+            "children": ["Médecin", "Pharmacie", "Mutuelle"]
+        },
+        "Loisirs": {
+            "icon": "/default/icons/gamepad.png",
+            "color": "#14b8a6",
+            "children": ["Sorties", "Sport", "Jeux vidéo", "Culture"]
+        },
+        "Achats": {
+            "icon": "/default/icons/bag.png",
+            "color": "#06b6d4",
+            "children": ["Vêtements", "High-tech", "Mobilier"]
+        },
+        "Abonnements": {
+            "icon": "/default/icons/repeat.png",
+            "color": "#3b82f6",
+            "children": ["Streaming", "Téléphone", "Internet"]
+        },
+        "Éducation": {
+            "icon": "/default/icons/book.png",
+            "color": "#6366f1",
+            "children": ["Formations", "Livres", "Fournitures"]
+        },
+        "Cadeaux": {
+            "icon": "/default/icons/gift.png",
+            "color": "#8b5cf6",
+            "children": []
+        },
+        "Voyages": {
+            "icon": "/default/icons/plane.png",
+            "color": "#a855f7",
+            "children": ["Hébergement", "Billets", "Activités"]
+        },
+        "Autres dépenses": {
+            "icon": "/default/icons/money.png",
+            "color": "#ec4899",
+            "children": []
+        },
+    },
+    "income": {
+        "Salaire": {
+            "icon": "/default/icons/salary.png",
+            "color": "#22c55e",
+            "children": []
+        },
+        "Travail indépendant": {
+            "icon": "/default/icons/briefcase.png",
+            "color": "#10b981",
+            "children": ["Missions", "Consulting"]
+        },
+        "Investissements": {
+            "icon": "/default/icons/chart.png",
+            "color": "#14b8a6",
+            "children": ["Dividendes", "Plus-values"]
+        },
+        "Remboursements": {
+            "icon": "/default/icons/refresh.png",
+            "color": "#06b6d4",
+            "children": []
+        },
+        "Cadeaux reçus": {
+            "icon": "/default/icons/gift.png",
+            "color": "#0ea5e9",
+            "children": []
+        },
+        "Autres revenus": {
+            "icon": "/default/icons/plus.png",
+            "color": "#3b82f6",
+            "children": []
+        },
+    }
+}
+
+
+def _flatten(categories: dict) -> tuple:
+    """Returns (parents, children) as (index, parent_index, name, type, icon, color) tuples."""
+    parents, children = [], []
+    for cat_type, roots in categories.items():
+        for parent_name, parent_data in roots.items():
+            parent_index = len(parents) + len(children)
+            parents.append((parent_index, None, parent_name, cat_type, parent_data["icon"], parent_data["color"]))
+            for child_name in parent_data["children"]:
+                children.append((len(parents) + len(children), parent_index, child_name, cat_type,
+                                 parent_data["icon"], parent_data["color"]))
+    return parents, children
+
+
+TEMPLATE_PARENTS, TEMPLATE_CHILDREN = _flatten(DEFAULT_CATEGORIES)
+TEMPLATE_SIZE = len(TEMPLATE_PARENTS) + len(TEMPLATE_CHILDREN)
+TEMPLATE_CLOSURE = closure_rows(
+    (index, parent_index) for index, parent_index, *_ in TEMPLATE_PARENTS + TEMPLATE_CHILDREN
+)
+
+INSERT_CATEGORIES = """
+    INSERT INTO mm_categories (cat_id, cat_usr_id, cat_parent_id, cat_name, cat_type, cat_icon, cat_color, cat_is_default)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, FALSE)
+"""
+
+
+def provision_default_categories(cursor, user_id: str) -> list:
+    """Creates the default categories of a user. Returns their ids, in template order."""
+    ids = [str(uuid.uuid4()) for _ in range(TEMPLATE_SIZE)]
+
+    # Parents puis enfants : la clé étrangère cat_parent_id est vérifiée ligne par ligne
+    for rows in (TEMPLATE_PARENTS, TEMPLATE_CHILDREN):
+        cursor.executemany(INSERT_CATEGORIES, [
+            (ids[index], user_id, ids[parent_index] if parent_index is not None else None,
+             name, cat_type, icon, color)
+            for index, parent_index, name, cat_type, icon, color in rows
+        ])
+
+    insert_closure_rows(cursor, [
+        (ids[ancestor], ids[descendant], depth) for ancestor, descendant, depth in TEMPLATE_CLOSURE
+    ])
+    return ids
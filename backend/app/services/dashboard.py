@@ -0,0 +1,171 @@
+"""
+Aggregation engine for the account dashboard comparison chart.
+
+The current and previous year are fetched with a single query on the
+monthly aggregates (year-month x type x category) and pivoted in memory,
+instead of issuing two queries per month.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from app.services.projection import expand, load_schedules
+
+MOIS_FR = {
+    1: 'Jan', 2: 'Fév', 3: 'Mar', 4: 'Avr',
+    5: 'Mai', 6: 'Juin', 7: 'Juil', 8: 'Août',
+    9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Déc'
+}
+
+UNCATEGORIZED_NAME = 'Sans catégorie'
+UNCATEGORIZED_COLOR = '#6b7280'
+
+
+def _new_month():
+    return {'expenses': {}, 'total_income': Decimal(0)}
+
+
+def _add_row(month, row):
+    """Ajoute une ligne agrégée (type x catégorie) aux données d'un mois."""
+    if row['type'] == 'income':
+        month['total_income'] += row['total']
+        return
+    name = row['cat_name'] or UNCATEGORIZED_NAME
+    entry = month['expenses'].setdefault(
+        name, {'total': Decimal(0), 'color': row['cat_color'] or UNCATEGORIZED_COLOR}
+    )
+    entry['total'] += row['total']
+
+
+def _finalize(month):
+    """Convertit les montants en float et calcule les totaux du mois."""
+    expenses = {
+        name: {'total': float(cat['total']), 'color': cat['color']}
+        for name, cat in month['expenses'].items()
+    }
+    total_income = float(month['total_income'])
+    total_expenses = sum(cat['total'] for cat in expenses.values())
+    reste = max(0, total_income - total_expenses)
+
+    return {
+        'expenses': expenses,
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'reste': reste
+    }
+
+
+def fetch_monthly_totals(cursor, account_id, first_month, last_month):
+    """
+    Returns {(year, month): month_data} for every month with income or
+    expense transactions between first_month and last_month (first days
+    of months), read from the monthly aggregates in one query.
+    """
+    cursor.execute("""
+        SELECT YEAR(m.mag_month) as year, MONTH(m.mag_month) as month, m.mag_type as type,
+               c.cat_name, c.cat_color, m.mag_total as total
+        FROM mm_monthly_aggregates m
+        LEFT JOIN mm_categories c ON c.cat_id = m.mag_cat_id
+        WHERE m.mag_acc_id = %s AND m.mag_type IN ('income', 'expense')
+          AND m.mag_month BETWEEN %s AND %s
+    """, (account_id, first_month, last_month))
+
+    months = {}
+    for row in cursor.fetchall():
+        month = months.setdefault((row['year'], row['month']), _new_month())
+        _add_row(month, row)
+    return months
+
+
+def fetch_recurring_months(cursor, account_id, today: date) -> dict:
+    """
+    Forecast of the months after today until the end of the year:
+    {(year, month): month_data} from the occurrences of the active
+    recurring items (a weekly item counts four or five times a month).
+    """
+    months = {}
+    if today.month == 12:
+        return months
+    first_month = date(today.year, today.month + 1, 1)
+    for day, recurring in expand(load_schedules(cursor, account_id=account_id),
+                                 first_month, date(today.year, 12, 31)):
+        month = months.setdefault((day.year, day.month), _new_month())
+        _add_row(month, {
+            'type': recurring['type'],
+            'cat_name': recurring['category_name'],
+            'cat_color': recurring['category_color'],
+            'total': recurring['amount'],
+        })
+    return months
+
+
+def build_category_comparison(cursor, account_id, today: date) -> dict:
+    """
+    Builds the `category_comparison` payload of the account dashboard:
+    expenses per category for each month of the current year (forecast
+    from recurring items for future months) against the previous year.
+    """
+    current_year = today.year
+    months = fetch_monthly_totals(
+        cursor, account_id, date(current_year - 1, 1, 1), date(current_year, today.month, 1)
+    )
+    forecast = fetch_recurring_months(cursor, account_id, today)
+
+    comparison_months = []
+    all_categories = set()
+    category_colors = {}
+
+    for m in range(1, 13):
+        is_forecast = m > today.month
+        if is_forecast:
+            current_data = _finalize(forecast.get((current_year, m), _new_month()))
+        else:
+            current_data = _finalize(months.get((current_year, m), _new_month()))
+        last_year_data = _finalize(months.get((current_year - 1, m), _new_month()))
+
+        for data in (current_data, last_year_data):
+            for cat_name, cat_data in data['expenses'].items():
+                all_categories.add(cat_name)
+                if cat_name not in category_colors:
+                    category_colors[cat_name] = cat_data['color']
+
+        comparison_months.append({
+            'month': MOIS_FR[m],
+            'is_forecast': is_forecast,
+            'current_year': {'year': current_year, 'data': current_data},
+            'last_year': {'year': current_year - 1, 'data': last_year_data}
+        })
+
+    comparison_data = {
+        'months': [m['month'] for m in comparison_months],
+        'categories': list(all_categories),
+        'category_colors': category_colors,
+        'current_year': current_year,
+        'last_year': current_year - 1,
+        'data': []
+    }
+
+    for month_data in comparison_months:
+        current = month_data['current_year']['data']
+        last = month_data['last_year']['data']
+
+        comparison_data['data'].append({
+            'month': month_data['month'],
+            'is_forecast': month_data['is_forecast'],
+            'current_year': {
+                'year': month_data['current_year']['year'],
+                'categories': {cat: current['expenses'].get(cat, {}).get('total', 0) for cat in all_categories},
+                'total_income': current['total_income'],
+                'total_expenses': current['total_expenses'],
+                'reste': current['reste']
+            },
+            'last_year': {
+                'year': month_data['last_year']['year'],
+                'categories': {cat: last['expenses'].get(cat, {}).get('total', 0) for cat in all_categories},
+                'total_income': last['total_income'],
+                'total_expenses': last['total_expenses'],
+                'reste': last['reste']
+            }
+        })
+
+    return comparison_data
@@ -0,0 +1,62 @@
+"""
+Transaction export formats (CSV, NDJSON).
+
+Both encoders consume row batches from a server-side cursor and yield one
+text chunk per batch, so a StreamingResponse never holds more than one
+batch in memory.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+EXPORT_COLUMNS = [
+    'id', 'date', 'type', 'amount', 'description',
+    'account_id', 'account_name', 'target_account_id', 'target_account_name',
+    'category_id', 'category_name', 'recurring_id', 'created_at',
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def encode_csv(batches):
+    """Yields the CSV header, then one chunk of lines per batch."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def encode_ndjson(batches):
+    """Yields one chunk of JSON lines per batch."""
+    for rows in batches:
+        yield ''.join(
+            json.dumps({column: row.get(column) for column in EXPORT_COLUMNS},
+                       default=_json_default, ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+}
@@ -0,0 +1,44 @@
+"""
+HTTP caching helpers: ETag computation and conditional JSON responses.
+
+A client that sends back the ETag of its copy in If-None-Match gets an
+empty 304 instead of the payload. When the ETag can be known before the
+payload is built (data version, see app.services.versions), the route can
+answer not_modified() without building it.
+"""
+
+import hashlib
+
+import orjson
+from fastapi import Request, Response
+
+from app.responses import FastJSONResponse, dumps
+
+
+def compute_etag(payload) -> str:
+    """Strong ETag of a JSON-serializable payload."""
+    return f'"{hashlib.sha1(dumps(payload, orjson.OPT_SORT_KEYS)).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if If-None-Match lists this ETag (weak comparison, as for GET)."""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = {value.strip().removeprefix('W/') for value in header.split(',')}
+    return etag.removeprefix('W/') in candidates
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """Empty 304 response: the client copy is current."""
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control})
+
+
+def conditional_json(request: Request, payload, cache_control: str, etag: str = None) -> Response:
+    """JSON response with ETag and Cache-Control, or 304 if the client copy is current."""
+    etag = etag or compute_etag(payload)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    return FastJSONResponse(payload, headers={'ETag': etag, 'Cache-Control': cache_control})
@@ -0,0 +1,116 @@
+"""
+In-memory icon catalogs (default icons and per-user uploads).
+
+A catalog keeps the sorted icon list of one directory and its ETag. It is
+rebuilt only when the directory mtime changes: adding, removing or
+renaming a file updates the mtime of its directory, so a request costs one
+stat() instead of an iterdir() and a sort (and the rendition lookup of
+each icon). Uploads and deletions made through the API update the catalog
+in place.
+"""
+
+import bisect
+import threading
+from pathlib import Path
+
+from app.services.http_cache import compute_etag
+from app.services.images import renditions_for
+from app.services.uploads import FRONTEND_PUBLIC_PATH
+
+ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+
+_UNSCANNED = object()
+
+
+class IconCatalog:
+    """Sorted icons of a directory, served under url_prefix."""
+
+    def __init__(self, directory: Path, url_prefix: str):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self._lock = threading.Lock()
+        self._mtime = _UNSCANNED
+        self._icons = []
+        self._etag = compute_etag([])
+
+    def _directory_mtime(self):
+        try:
+            return self.directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _entry(self, filename: str) -> dict:
+        return {
+            "name": Path(filename).stem,
+            "path": f"{self.url_prefix}/{filename}",
+            "renditions": renditions_for(filename),
+        }
+
+    def _scan(self) -> list:
+        if not self.directory.exists():
+            return []
+        return sorted(
+            (self._entry(file.name) for file in self.directory.iterdir()
+             if file.suffix.lower() in ALLOWED_EXTENSIONS),
+            key=lambda icon: icon['name']
+        )
+
+    def get(self) -> tuple:
+        """Returns (icons, etag), rescanning the directory if it changed."""
+        mtime = self._directory_mtime()
+        with self._lock:
+            if mtime != self._mtime:
+                self._icons = self._scan()
+                self._etag = compute_etag(self._icons)
+                self._mtime = mtime
+            return self._icons, self._etag
+
+    def find(self, icon_name: str) -> Path | None:
+        """File of an icon given its name or file name."""
+        icons, _ = self.get()
+        for icon in icons:
+            filename = icon['path'].rsplit('/', 1)[1]
+            if icon['name'] == icon_name or filename == icon_name:
+                return self.directory / filename
+        return None
+
+    def add(self, filename: str):
+        """Records a file just written in the directory, without rescanning it."""
+        entry = self._entry(filename)
+        with self._lock:
+            if self._mtime is _UNSCANNED:
+                return
+            icons = [icon for icon in self._icons if icon['path'] != entry['path']]
+            bisect.insort(icons, entry, key=lambda icon: icon['name'])
+            self._update(icons)
+
+    def remove(self, filename: str):
+        """Records a file just deleted from the directory, without rescanning it."""
+        path = f"{self.url_prefix}/{filename}"
+        with self._lock:
+            if self._mtime is _UNSCANNED:
+                return
+            self._update([icon for icon in self._icons if icon['path'] != path])
+
+    def _update(self, icons: list):
+        # Nouvelle liste (les lecteurs gardent l'ancienne), mtime après notre écriture
+        self._icons = icons
+        self._etag = compute_etag(icons)
+        self._mtime = self._directory_mtime()
+
+
+default_icons = IconCatalog(FRONTEND_PUBLIC_PATH / "default" / "icons", "/default/icons")
+
+_user_catalogs = {}
+_user_catalogs_lock = threading.Lock()
+
+
+def user_icons(user_id: str) -> IconCatalog:
+    """Catalog of the icons uploaded by a user."""
+    with _user_catalogs_lock:
+        catalog = _user_catalogs.get(user_id)
+        if catalog is None:
+            catalog = IconCatalog(FRONTEND_PUBLIC_PATH / "uploads" / "icons" / str(user_id),
+                                  f"/uploads/icons/{user_id}")
+            _user_catalogs[user_id] = catalog
+        return catalog
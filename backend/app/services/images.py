@@ -0,0 +1,109 @@
+"""
+WebP renditions of uploaded images (avatars and icons).
+
+An uploaded image is decoded once, in a dedicated thread pool, and resized
+to IMAGE_RENDITION_SIZES (bounding squares, aspect ratio kept). The
+renditions are stored next to the blob in the content-addressed store
+(<sha256>_<size>.webp), so an image uploaded again is not decoded again
+and the renditions are deleted with the blob. Re-encoding also drops the
+EXIF metadata (GPS position of phone photos).
+
+Pillow releases the GIL while decoding, resizing and encoding, so the pool
+uses several cores; its size also bounds the memory used by decoded
+pixels (a 12 Mpx photo takes about 48 MB).
+"""
+
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from app.config import get_settings
+from app.services.uploads import BLOBS_PATH, FRONTEND_PUBLIC_PATH, blob_path
+
+settings = get_settings()
+
+RENDITION_SIZES = tuple(sorted(settings.IMAGE_RENDITION_SIZES, reverse=True))
+BLOBS_URL = "/" + BLOBS_PATH.relative_to(FRONTEND_PUBLIC_PATH).as_posix()
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+image_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS or os.cpu_count(),
+    thread_name_prefix="images",
+)
+
+
+class InvalidImageError(ValueError):
+    """The upload cannot be decoded as an image."""
+
+
+def rendition_path(digest: str, size: int) -> Path:
+    return blob_path(digest, f"_{size}.webp")
+
+
+def rendition_urls(digest: str) -> dict:
+    """URLs of the renditions of a blob, by size (largest first)."""
+    return {str(size): f"{BLOBS_URL}/{digest[:2]}/{digest}_{size}.webp" for size in RENDITION_SIZES}
+
+
+def renditions_for(url: str | None) -> dict | None:
+    """
+    Renditions of a published file (avatar or icon URL, or file name),
+    None if it has none (file uploaded before renditions existed).
+    """
+    if not url:
+        return None
+    digest = Path(url).stem.rsplit('_', 1)[-1]
+    if not _DIGEST.fullmatch(digest) or not rendition_path(digest, RENDITION_SIZES[0]).exists():
+        return None
+    return rendition_urls(digest)
+
+
+def _decode(blob: Path) -> Image.Image:
+    try:
+        with Image.open(blob) as image:
+            if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+                raise InvalidImageError("Image trop grande")
+            # JPEG : décodage directement à l'échelle 1/2, 1/4 ou 1/8 si possible
+            # (en gardant au moins 2x le plus grand rendu pour la qualité)
+            image.draft(None, (2 * RENDITION_SIZES[0], 2 * RENDITION_SIZES[0]))
+            transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            image = ImageOps.exif_transpose(image)
+            return image.convert('RGBA' if transparent else 'RGB')
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(f"Image illisible: {e}")
+
+
+def _render(blob: Path):
+    digest = blob.stem
+    missing = [size for size in RENDITION_SIZES if not rendition_path(digest, size).exists()]
+    if not missing:
+        return
+
+    image = _decode(blob)
+    # Du plus grand au plus petit : chaque rendu est réduit à partir du précédent
+    for size in RENDITION_SIZES:
+        image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        if size not in missing:
+            continue
+        fd, temp_name = tempfile.mkstemp(dir=blob.parent, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                image.save(temp, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY, method=4)
+            os.replace(temp_name, rendition_path(digest, size))
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.unlink(temp_name)
+            raise
+
+
+def create_renditions(blob: Path) -> dict:
+    """
+    Decodes a blob in the image pool and writes its missing renditions.
+    Returns their URLs. Raises InvalidImageError if the blob is not an image.
+    """
+    image_executor.submit(_render, blob).result()
+    return rendition_urls(blob.stem)
@@ -0,0 +1,147 @@
+"""
+Closed-form occurrence engine for recurring schedules.
+
+A schedule is a grid anchored on rec_start_date: occurrence i is the
+start date plus i periods (days for daily/weekly/biweekly, months for
+monthly to annual). Month periods are always added to the anchor, never
+chained, so a schedule starting on the 31st stays on the last day of the
+shorter months and returns to the 31st afterwards.
+
+Any occurrence, the index of the first occurrence on or after a date and
+the number of occurrences in a window are computed directly, so
+processing, forecasts and calendars never step through the dates one by
+one. rec_end_date and rec_occurrences_limit bound the grid to a range of
+indexes [first, stop).
+"""
+
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+
+# rec_frequency -> (unit, number of units per period)
+FREQUENCIES = {
+    'daily': ('days', 1),
+    'weekly': ('days', 7),
+    'biweekly': ('days', 14),
+    'monthly': ('months', 1),
+    'quarterly': ('months', 3),
+    'semi_annual': ('months', 6),
+    'annual': ('months', 12),
+}
+
+
+def _period(frequency: str) -> tuple:
+    # Fréquence inconnue : mensuelle, comme l'ancien calcul
+    return FREQUENCIES.get(frequency, FREQUENCIES['monthly'])
+
+
+def nth_occurrence(frequency: str, anchor: date, index: int) -> date:
+    """Date of occurrence `index` (0 = anchor) of a schedule."""
+    unit, step = _period(frequency)
+    if unit == 'days':
+        return anchor + timedelta(days=index * step)
+    return anchor + relativedelta(months=index * step)
+
+
+def index_on_or_after(frequency: str, anchor: date, day: date) -> int:
+    """Smallest occurrence index whose date is on or after `day`."""
+    unit, step = _period(frequency)
+    if unit == 'days':
+        return max(0, -(-(day - anchor).days // step))
+    months = (day.year - anchor.year) * 12 + day.month - anchor.month
+    index = max(0, -(-months // step))
+    # Jour écrêté en fin de mois (31 -> 30) : l'occurrence suivante
+    if nth_occurrence(frequency, anchor, index) < day:
+        index += 1
+    return index
+
+
+class Schedule:
+    """
+    Occurrences of one recurring row.
+
+    anchor: date of occurrence 0 (rec_start_date).
+    first: index of the next occurrence to generate.
+    stop: index after the last occurrence (end date or limit), None if unbounded.
+    """
+
+    __slots__ = ('frequency', 'anchor', 'first', 'stop')
+
+    def __init__(self, frequency: str, anchor: date, first: int = 0,
+                 end_date: date = None, remaining: int = None):
+        self.frequency = frequency
+        self.anchor = anchor
+        self.first = first
+        self.stop = None
+        if remaining is not None:
+            self.stop = first + max(remaining, 0)
+        if end_date is not None:
+            end_stop = self.index_on_or_after(end_date + timedelta(days=1))
+            self.stop = end_stop if self.stop is None else min(self.stop, end_stop)
+
+    @classmethod
+    def from_recurring(cls, recurring) -> 'Schedule':
+        """
+        Builds the schedule of an mm_recurring row (rec_* columns). The next
+        occurrence is the first grid date on or after rec_next_occurrence.
+        """
+        frequency = recurring['rec_frequency']
+        anchor = recurring['rec_start_date']
+        first = index_on_or_after(frequency, anchor, recurring['rec_next_occurrence'] or anchor)
+
+        limit = recurring['rec_occurrences_limit']
+        remaining = limit - recurring['rec_occurrences_count'] if limit else None
+        return cls(frequency, anchor, first, recurring['rec_end_date'], remaining)
+
+    def nth(self, index: int) -> date:
+        """Date of occurrence `index` of the grid, bounds not checked."""
+        return nth_occurrence(self.frequency, self.anchor, index)
+
+    def index_on_or_after(self, day: date) -> int:
+        return index_on_or_after(self.frequency, self.anchor, day)
+
+    def occurrence(self, k: int = 0) -> date | None:
+        """k-th occurrence still to generate (0 = the next one), None past the end."""
+        index = self.first + k
+        if k < 0 or (self.stop is not None and index >= self.stop):
+            return None
+        return self.nth(index)
+
+    def window(self, start: date = None, end: date = None) -> range:
+        """Indexes of the occurrences between start and end (inclusive, None = unbounded)."""
+        low = self.first if start is None else max(self.first, self.index_on_or_after(start))
+        high = self.stop
+        if end is not None:
+            end_index = self.index_on_or_after(end + timedelta(days=1))
+            high = end_index if high is None else min(high, end_index)
+        if high is None:
+            raise ValueError("Fenêtre non bornée pour une récurrence sans fin")
+        return range(low, max(low, high))
+
+    def count_between(self, start: date = None, end: date = None) -> int:
+        return len(self.window(start, end))
+
+    def between(self, start: date = None, end: date = None) -> list:
+        return [self.nth(index) for index in self.window(start, end)]
+
+    def is_finished(self, consumed: int = 0) -> bool:
+        """True once `consumed` more occurrences exhaust the schedule."""
+        return self.stop is not None and self.first + consumed >= self.stop
+
+
+def count_between_many(schedules, start: date = None, end: date = None) -> list:
+    """Number of occurrences of each schedule in the window, in order."""
+    return [schedule.count_between(start, end) for schedule in schedules]
+
+
+def occurrences_between_many(schedules, start: date = None, end: date = None) -> list:
+    """
+    All occurrences of many schedules in the window, as (position, date)
+    pairs sorted by date, position being the index in `schedules`.
+    """
+    occurrences = [
+        (position, day)
+        for position, schedule in enumerate(schedules)
+        for day in schedule.between(start, end)
+    ]
+    occurrences.sort(key=lambda occurrence: occurrence[1])
+    return occurrences
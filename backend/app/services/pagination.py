@@ -0,0 +1,56 @@
+"""
+Keyset (seek) pagination of transaction listings.
+
+Listings are ordered by (trx_date, created_at, trx_id) descending. The
+cursor is an opaque token holding the sort key of the last row returned;
+the next page starts strictly after it, so deep pages cost the same as the
+first one instead of scanning and discarding OFFSET rows.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+
+TRANSACTION_ORDER = "t.trx_date DESC, t.created_at DESC, t.trx_id DESC"
+
+# Lignes strictement après le curseur dans l'ordre décroissant
+TRANSACTION_SEEK = """(t.trx_date < %s
+    OR (t.trx_date = %s AND (t.created_at < %s
+        OR (t.created_at = %s AND t.trx_id < %s))))"""
+
+
+class InvalidCursorError(ValueError):
+    """The pagination cursor could not be decoded."""
+
+
+def encode_cursor(row) -> str:
+    """Encodes the sort key of a listed transaction (date, created_at, id)."""
+    key = [row['date'].isoformat(), row['created_at'].isoformat(), row['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> tuple:
+    """Returns (trx_date, created_at, trx_id) from a cursor token."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        trx_date, created_at, trx_id = json.loads(base64.urlsafe_b64decode(padded))
+        return date.fromisoformat(trx_date), datetime.fromisoformat(created_at), str(trx_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(token) from e
+
+
+def seek_params(key: tuple) -> list:
+    """Parameters of TRANSACTION_SEEK for a decoded cursor."""
+    trx_date, created_at, trx_id = key
+    return [trx_date, trx_date, created_at, created_at, trx_id]
+
+
+def paginate(rows, limit: int) -> tuple:
+    """
+    Splits the limit + 1 rows fetched by a listing into the page and the
+    cursor of the next page (None on the last page).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1])
@@ -0,0 +1,153 @@
+"""
+Cash-flow projection from the recurring schedules.
+
+The active schedules are loaded with one query and expanded over the
+horizon by the occurrence engine (app.services.occurrences). Projected
+balances start from the current account balances: one entry per day with
+an occurrence and one per month, for each account and for all accounts.
+"""
+
+from calendar import monthrange
+from datetime import date
+from decimal import Decimal
+
+from app.services.occurrences import Schedule
+
+
+def load_schedules(cursor, user_id: str = None, account_id: str = None) -> list:
+    """
+    Active recurring rows of a user or of an account, as
+    (recurring, schedule) pairs. recurring holds the API field names.
+    """
+    conditions = ["r.rec_is_active = TRUE"]
+    params = []
+    if user_id:
+        conditions.append("r.rec_usr_id = %s")
+        params.append(user_id)
+    if account_id:
+        conditions.append("r.rec_acc_id = %s")
+        params.append(account_id)
+
+    cursor.execute(f"""
+        SELECT r.rec_id, r.rec_acc_id, r.rec_type, r.rec_amount, r.rec_description,
+               r.rec_frequency, r.rec_start_date, r.rec_next_occurrence, r.rec_end_date,
+               r.rec_occurrences_limit, r.rec_occurrences_count,
+               c.cat_name, c.cat_icon, c.cat_color
+        FROM mm_recurring r
+        LEFT JOIN mm_categories c ON r.rec_cat_id = c.cat_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY r.rec_next_occurrence ASC
+    """, params)
+
+    return [
+        ({
+            'id': row['rec_id'],
+            'account_id': row['rec_acc_id'],
+            'type': row['rec_type'],
+            'amount': row['rec_amount'],
+            'description': row['rec_description'],
+            'frequency': row['rec_frequency'],
+            'next_occurrence': row['rec_next_occurrence'],
+            'category_name': row['cat_name'],
+            'category_icon': row['cat_icon'],
+            'category_color': row['cat_color'],
+        }, Schedule.from_recurring(row))
+        for row in cursor.fetchall()
+    ]
+
+
+def expand(schedules, start: date, end: date, overdue: bool = False) -> list:
+    """
+    Occurrences between start and end as (date, recurring) pairs sorted by
+    date. With overdue, occurrences not generated yet before start are
+    counted on start (they will be on the next processing).
+    """
+    occurrences = []
+    for recurring, schedule in schedules:
+        for day in schedule.between(None if overdue else start, end):
+            occurrences.append((max(day, start), recurring))
+    occurrences.sort(key=lambda occurrence: occurrence[0])
+    return occurrences
+
+
+def month_ends(start: date, end: date) -> list:
+    """Last day of every month from start to end (end itself for the last one)."""
+    days = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        days.append(min(date(year, month, monthrange(year, month)[1]), end))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return days
+
+
+def horizon_end(start: date, months: int) -> date:
+    """Last day of the months-th month of a horizon starting in start's month."""
+    year, month = divmod(start.month - 1 + months - 1, 12)
+    year, month = start.year + year, month + 1
+    return date(year, month, monthrange(year, month)[1])
+
+
+def _series(balance, movements: dict, months: list) -> dict:
+    """Daily and monthly balances from {date: [income, expense]}."""
+    daily = []
+    running = balance
+    for day in sorted(movements):
+        income, expense = movements[day]
+        running += income - expense
+        daily.append({
+            'date': day.isoformat(),
+            'income': float(income),
+            'expense': float(expense),
+            'balance': float(running),
+        })
+
+    per_month = {}
+    for day, (income, expense) in movements.items():
+        totals = per_month.setdefault((day.year, day.month), [Decimal(0), Decimal(0)])
+        totals[0] += income
+        totals[1] += expense
+
+    monthly = []
+    running = balance
+    for month_end in months:
+        income, expense = per_month.get((month_end.year, month_end.month), (Decimal(0), Decimal(0)))
+        running += income - expense
+        monthly.append({
+            'month': month_end.strftime('%Y-%m'),
+            'income': float(income),
+            'expense': float(expense),
+            'balance': float(running),
+        })
+
+    return {'balance': float(balance), 'projected_balance': float(running), 'daily': daily, 'monthly': monthly}
+
+
+def project_balances(accounts, schedules, start: date, end: date) -> dict:
+    """
+    Projects the balances of accounts (mappings with id and balance) from
+    start to end. Returns the series of each account and of their total.
+    """
+    movements = {account['id']: {} for account in accounts}
+    total = {}
+    for day, recurring in expand(schedules, start, end, overdue=True):
+        if recurring['account_id'] not in movements:
+            continue
+        column = 0 if recurring['type'] == 'income' else 1
+        for target in (movements[recurring['account_id']], total):
+            target.setdefault(day, [Decimal(0), Decimal(0)])[column] += recurring['amount']
+
+    months = month_ends(start, end)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'accounts': [
+            {
+                'id': account['id'],
+                'name': account.get('name'),
+                'currency': account.get('currency'),
+                **_series(Decimal(str(account['balance'])), movements[account['id']], months),
+            }
+            for account in accounts
+        ],
+        'total': _series(sum((Decimal(str(a['balance'])) for a in accounts), Decimal(0)), total, months),
+    }
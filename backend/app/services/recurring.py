@@ -0,0 +1,144 @@
+"""
+Recurring transaction processing, shared by the per-user route and the
+background scheduler (app.scheduler).
+"""
+
+from datetime import date
+
+from app.services.occurrences import Schedule
+from app.services.transactions import insert_transactions
+from app.services.versions import bump_data_versions
+
+
+def find_due_recurring(cursor, today: date, user_id: str = None, after=None, limit: int = None) -> list:
+    """
+    Returns the ids of the active recurring rows due on or before today,
+    ordered by (rec_next_occurrence, rec_id) to use idx_rec_due.
+    after: (next_occurrence, rec_id) of the last row of the previous page.
+    """
+    conditions = ["rec_is_active = TRUE", "rec_next_occurrence <= %s"]
+    params = [today]
+    if user_id:
+        conditions.append("rec_usr_id = %s")
+        params.append(user_id)
+    if after:
+        conditions.append("(rec_next_occurrence > %s OR (rec_next_occurrence = %s AND rec_id > %s))")
+        params.extend([after[0], after[0], after[1]])
+
+    query = f"""
+        SELECT rec_id, rec_next_occurrence FROM mm_recurring
+        WHERE {' AND '.join(conditions)}
+        ORDER BY rec_next_occurrence, rec_id
+    """
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+def due_occurrences(recurring, today: date) -> tuple:
+    """
+    Occurrences of a recurring row to generate up to today, respecting
+    rec_end_date and rec_occurrences_limit (computed by the occurrence
+    engine, without stepping through the dates).
+    Returns (dates, next_occurrence, occurrences_count, is_active).
+    """
+    schedule = Schedule.from_recurring(recurring)
+    dates = schedule.between(end=today)
+    next_occurrence = schedule.nth(schedule.first + len(dates))
+    occurrences_count = (recurring['rec_occurrences_count'] or 0) + len(dates)
+    return dates, next_occurrence, occurrences_count, not schedule.is_finished(len(dates))
+
+
+def _existing_occurrences(cursor, occurrences) -> set:
+    """(recurring_id, date) pairs already generated, e.g. before a start date change."""
+    if not occurrences:
+        return set()
+    recurring_ids = list({trx['recurring_id'] for trx in occurrences})
+    placeholders = ','.join(['%s'] * len(recurring_ids))
+    cursor.execute(f"""
+        SELECT trx_rec_id, trx_date FROM mm_transactions
+        WHERE trx_rec_id IN ({placeholders}) AND trx_date BETWEEN %s AND %s
+    """, recurring_ids + [min(trx['date'] for trx in occurrences), max(trx['date'] for trx in occurrences)])
+    return {(row['trx_rec_id'], row['trx_date']) for row in cursor.fetchall()}
+
+
+def process_recurring(cursor, recurring_ids, today: date) -> list:
+    """
+    Generates the transactions of the given recurring rows up to today and
+    moves them to their next occurrence. Rows that are no longer due are
+    skipped. Returns the created transactions.
+
+    The due rows are leased with SELECT ... FOR UPDATE SKIP LOCKED: a row
+    being processed by another worker or request is skipped rather than
+    waited for, and once that transaction commits the row is no longer due.
+    Occurrences already present in mm_transactions (unique key on
+    trx_rec_id, trx_date) are not generated again.
+
+    All occurrences are collected first, then written with one multi-row
+    INSERT, one balance UPDATE per account and one UPDATE per recurring row.
+    The data versions of the owners are bumped in the same transaction.
+    """
+    if not recurring_ids:
+        return []
+
+    placeholders = ','.join(['%s'] * len(recurring_ids))
+    cursor.execute(f"""
+        SELECT r.rec_id, r.rec_usr_id, r.rec_acc_id, r.rec_cat_id, r.rec_type, r.rec_amount,
+               r.rec_description, r.rec_frequency, r.rec_start_date, r.rec_next_occurrence, r.rec_end_date,
+               r.rec_occurrences_limit, r.rec_occurrences_count
+        FROM mm_recurring r
+        WHERE r.rec_id IN ({placeholders})
+          AND r.rec_is_active = TRUE
+          AND r.rec_next_occurrence <= %s
+        ORDER BY r.rec_id
+        FOR UPDATE SKIP LOCKED
+    """, list(recurring_ids) + [today])
+    recurring_due = cursor.fetchall()
+
+    occurrences = []
+    states = []
+    for recurring in recurring_due:
+        dates, next_occurrence, occurrences_count, is_active = due_occurrences(recurring, today)
+        states.append((next_occurrence, occurrences_count, is_active, recurring['rec_id']))
+        occurrences.extend({
+            'recurring_id': recurring['rec_id'],
+            'account_id': recurring['rec_acc_id'],
+            'category_id': recurring['rec_cat_id'],
+            'type': recurring['rec_type'],
+            'amount': recurring['rec_amount'],
+            'date': occurrence,
+            'description': recurring['rec_description'],
+        } for occurrence in dates)
+
+    existing = _existing_occurrences(cursor, occurrences)
+    occurrences = [
+        trx for trx in occurrences
+        if (trx['recurring_id'], trx['date']) not in existing
+    ]
+    ids = insert_transactions(cursor, occurrences)
+
+    for state in states:
+        cursor.execute("""
+            UPDATE mm_recurring
+            SET rec_next_occurrence = %s, rec_occurrences_count = %s, rec_is_active = %s
+            WHERE rec_id = %s
+        """, state)
+
+    # Soldes et récurrences modifiés : les ETag des lectures de ces utilisateurs changent
+    bump_data_versions(cursor, [recurring['rec_usr_id'] for recurring in recurring_due])
+
+    return [
+        {
+            'id': transaction_id,
+            'recurring_id': trx['recurring_id'],
+            'account_id': trx['account_id'],
+            'category_id': trx['category_id'],
+            'type': trx['type'],
+            'amount': float(trx['amount']),
+            'date': str(trx['date']),
+            'description': trx['description']
+        }
+        for transaction_id, trx in zip(ids, occurrences)
+    ]
@@ -0,0 +1,338 @@
+"""
+Bank statement import (CSV, OFX, QIF).
+
+The file is read line by line through a generator pipeline:
+
+    parse -> normalize -> fingerprint -> batches -> dedupe -> categorize -> insert
+
+Only one batch of transactions is held in memory at a time. Each batch is
+written in its own DB transaction (one balance update per batch), so a
+large import makes steady progress. Every imported row carries a
+fingerprint (trx_import_ref), so re-importing a file, or a statement that
+overlaps a previous one, skips the rows already imported.
+"""
+
+import csv
+import hashlib
+import itertools
+import re
+import unicodedata
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from app.database import get_db
+from app.services.transactions import insert_transactions
+from app.services.versions import bump_data_versions
+
+STATEMENT_FORMATS = ('csv', 'ofx', 'qif')
+FORMAT_EXTENSIONS = {'.csv': 'csv', '.ofx': 'ofx', '.qfx': 'ofx', '.qif': 'qif'}
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d/%m/%y', '%d.%m.%Y', '%d-%m-%Y', '%Y%m%d')
+
+
+class StatementFormatError(ValueError):
+    """The statement file cannot be read in the requested format."""
+
+
+def _simplify(text: str) -> str:
+    """Lowercase without accents, for header and keyword matching."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower().strip()
+
+
+# =============================================================================
+# Parse: one raw record (strings) per transaction
+# =============================================================================
+
+CSV_COLUMNS = {
+    'date': ('date operation', 'date', 'date comptable', 'date valeur', 'booking date'),
+    'description': ('libelle', 'description', 'label', 'intitule', 'libelle operation', 'payee', 'memo'),
+    'amount': ('montant', 'amount', 'montant (eur)', 'montant(euros)'),
+    'debit': ('debit', 'debit (eur)', 'debit euros'),
+    'credit': ('credit', 'credit (eur)', 'credit euros'),
+}
+
+
+def _find_column(headers: dict, aliases) -> str | None:
+    for alias in aliases:
+        if alias in headers:
+            return headers[alias]
+    return None
+
+
+def parse_csv(lines):
+    """CSV with a header line; ';' or ',' separated (detected on the header)."""
+    try:
+        header = next(lines)
+    except StopIteration:
+        return
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    reader = csv.DictReader(itertools.chain([header], lines), delimiter=delimiter)
+
+    headers = {_simplify(name): name for name in reader.fieldnames or []}
+    columns = {field: _find_column(headers, aliases) for field, aliases in CSV_COLUMNS.items()}
+    if not columns['date'] or not (columns['amount'] or columns['debit'] or columns['credit']):
+        raise StatementFormatError("Colonnes date et montant introuvables dans l'en-tête CSV")
+
+    for row in reader:
+        yield {
+            'date': row.get(columns['date']),
+            'description': row.get(columns['description']) if columns['description'] else '',
+            'amount': row.get(columns['amount']) if columns['amount'] else None,
+            'debit': row.get(columns['debit']) if columns['debit'] else None,
+            'credit': row.get(columns['credit']) if columns['credit'] else None,
+            'ref': None,
+        }
+
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def parse_ofx(lines):
+    """OFX/QFX (SGML or XML): one record per <STMTTRN> block."""
+    current = None
+    for line in lines:
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    current = {}
+                elif current is not None:
+                    yield _ofx_record(current)
+                    current = None
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+    if current:
+        yield _ofx_record(current)
+
+
+def _ofx_record(fields: dict) -> dict:
+    description = ' - '.join(part for part in (fields.get('NAME'), fields.get('MEMO')) if part)
+    return {
+        'date': (fields.get('DTPOSTED') or '')[:8],
+        'description': description,
+        'amount': fields.get('TRNAMT'),
+        'ref': fields.get('FITID'),
+    }
+
+
+def parse_qif(lines):
+    """QIF: one field per line (D date, T amount, P payee, M memo), records end with '^'."""
+    current = {}
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('!'):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == '^':
+            if current:
+                yield _qif_record(current)
+            current = {}
+        elif code in 'DTUPM' and code not in current:
+            current[code] = value
+    if current:
+        yield _qif_record(current)
+
+
+def _qif_record(fields: dict) -> dict:
+    description = ' - '.join(part for part in (fields.get('P'), fields.get('M')) if part)
+    return {
+        # Années abrégées QIF : 1/05'24
+        'date': (fields.get('D') or '').replace("'", '/').replace(' ', ''),
+        'description': description,
+        'amount': fields.get('T') or fields.get('U'),
+        # N est un numéro de chèque, pas un identifiant unique
+        'ref': None,
+    }
+
+
+PARSERS = {'csv': parse_csv, 'ofx': parse_ofx, 'qif': parse_qif}
+
+
+# =============================================================================
+# Normalize: API field names, ISO date, positive amount, type from the sign
+# =============================================================================
+
+def parse_amount(value) -> Decimal | None:
+    """Parses '1 234,56', '-12.50', '1,234.56' or '12,50 €'."""
+    if value is None:
+        return None
+    text = re.sub(r'[^\d,.\-+]', '', str(value))
+    if not text:
+        return None
+    if ',' in text and '.' in text:
+        # Le dernier séparateur est le séparateur décimal
+        if text.rfind(',') > text.rfind('.'):
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    else:
+        text = text.replace(',', '.')
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def parse_date(value) -> str | None:
+    text = (value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize(records, stats: dict):
+    """Yields valid transactions; invalid rows are only counted in stats['errors']."""
+    for record in records:
+        stats['parsed'] += 1
+        amount = parse_amount(record.get('amount'))
+        if amount is None:
+            debit = parse_amount(record.get('debit'))
+            credit = parse_amount(record.get('credit'))
+            if debit:
+                amount = -abs(debit)
+            elif credit:
+                amount = abs(credit)
+        trx_date = parse_date(record.get('date'))
+
+        if not amount or not trx_date:
+            stats['errors'] += 1
+            continue
+
+        yield {
+            'date': trx_date,
+            'type': 'expense' if amount < 0 else 'income',
+            'amount': abs(amount),
+            'description': ' '.join((record.get('description') or '').split())[:255],
+            'ref': record.get('ref'),
+        }
+
+
+def fingerprint(transactions, account_id: str):
+    """
+    Sets import_ref: the bank transaction id when the format has one (OFX FITID),
+    otherwise a hash of the row content and its rank among identical rows of
+    the same day (two identical coffees on the same day are two rows).
+    Ranks are counted over the whole file, whose days may be interleaved; the
+    counter keeps a 20-byte digest per distinct row, not the row itself.
+    """
+    seen = {}
+    for trx in transactions:
+        if trx['ref']:
+            key = f"ref|{trx['ref']}"
+        else:
+            content = f"{trx['date']}|{trx['type']}|{trx['amount']}|{trx['description']}"
+            content_key = hashlib.sha1(content.encode()).digest()
+            rank = seen.get(content_key, 0)
+            seen[content_key] = rank + 1
+            key = f"row|{content}|{rank}"
+        trx['import_ref'] = hashlib.sha1(f"{account_id}|{key}".encode()).hexdigest()
+        trx['account_id'] = account_id
+        yield trx
+
+
+def batches(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+# =============================================================================
+# Per batch, inside its DB transaction
+# =============================================================================
+
+def dedupe(cursor, account_id: str, batch) -> list:
+    """Drops the rows already imported in the account (same import_ref)."""
+    refs = [trx['import_ref'] for trx in batch]
+    placeholders = ','.join(['%s'] * len(refs))
+    cursor.execute(f"""
+        SELECT trx_import_ref FROM mm_transactions
+        WHERE trx_acc_id = %s AND trx_import_ref IN ({placeholders})
+    """, [account_id] + refs)
+    existing = {row['trx_import_ref'] for row in cursor.fetchall()}
+
+    unique = []
+    for trx in batch:
+        if trx['import_ref'] not in existing:
+            existing.add(trx['import_ref'])
+            unique.append(trx)
+    return unique
+
+
+def categorize(cursor, user_id: str, categories, batch):
+    """
+    Sets category_id: the category last used by the user for the same
+    description, else the longest category name found in the description.
+    """
+    descriptions = list({trx['description'] for trx in batch if trx['description']})
+    history = {}
+    if descriptions:
+        placeholders = ','.join(['%s'] * len(descriptions))
+        cursor.execute(f"""
+            SELECT t.trx_description as description, t.trx_type as type, t.trx_cat_id as category_id
+            FROM mm_transactions t
+            JOIN mm_accounts a ON t.trx_acc_id = a.acc_id
+            WHERE a.acc_usr_id = %s AND t.trx_cat_id IS NOT NULL
+              AND t.trx_description IN ({placeholders})
+            ORDER BY t.trx_date DESC
+        """, [user_id] + descriptions)
+        for row in cursor.fetchall():
+            history.setdefault((row['description'], row['type']), row['category_id'])
+
+    for trx in batch:
+        category_id = history.get((trx['description'], trx['type']))
+        if not category_id:
+            description = _simplify(trx['description'])
+            matches = [
+                category for category in categories
+                if category['type'] == trx['type'] and category['keyword'] in description
+            ]
+            if matches:
+                category_id = max(matches, key=lambda category: len(category['keyword']))['id']
+        trx['category_id'] = category_id
+    return batch
+
+
+def load_categories(cursor, user_id: str) -> list:
+    cursor.execute("""
+        SELECT cat_id as id, cat_name as name, cat_type as type
+        FROM mm_categories WHERE cat_usr_id = %s
+    """, (user_id,))
+    return [
+        {**category, 'keyword': _simplify(category['name'])}
+        for category in cursor.fetchall()
+        if len(category['name']) >= 3
+    ]
+
+
+def import_statement(lines, statement_format: str, account: dict, batch_size: int):
+    """
+    Runs the pipeline and yields a progress dict after every batch, then a
+    final one with done=True. Format errors are reported as {'error': ...}.
+    """
+    stats = {'parsed': 0, 'errors': 0, 'duplicates': 0, 'inserted': 0, 'batches': 0}
+    with get_db() as (conn, cursor):
+        categories = load_categories(cursor, account['user_id'])
+
+    pipeline = fingerprint(normalize(PARSERS[statement_format](lines), stats), account['id'])
+    try:
+        for batch in batches(pipeline, batch_size):
+            with get_db() as (conn, cursor):
+                unique = dedupe(cursor, account['id'], batch)
+                categorize(cursor, account['user_id'], categories, unique)
+                insert_transactions(cursor, unique)
+                if unique:
+                    # Dans la transaction du lot : un ETag n'est jamais associé à un import partiel
+                    bump_data_versions(cursor, [account['user_id']])
+            stats['batches'] += 1
+            stats['duplicates'] += len(batch) - len(unique)
+            stats['inserted'] += len(unique)
+            yield dict(stats)
+    except StatementFormatError as e:
+        yield {**stats, 'error': str(e)}
+        return
+
+    yield {**stats, 'done': True}
@@ -0,0 +1,115 @@
+"""
+Batch transaction writes.
+
+A batch is validated with one query per referenced table, inserted with
+multi-row INSERTs, and applied to account balances as one net delta per
+account, so the cost of an import grows with the number of accounts it
+touches rather than with the number of transactions.
+"""
+
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from app.services.aggregates import record_transactions
+
+TRANSACTION_TYPES = ('income', 'expense', 'transfer')
+
+
+def _owned_ids(cursor, table: str, id_column: str, owner_column: str, user_id: str, ids) -> set:
+    ids = list({value for value in ids if value})
+    if not ids:
+        return set()
+    placeholders = ','.join(['%s'] * len(ids))
+    cursor.execute(f"""
+        SELECT {id_column} FROM {table}
+        WHERE {id_column} IN ({placeholders}) AND {owner_column} = %s
+    """, [*ids, user_id])
+    return {row[id_column] for row in cursor.fetchall()}
+
+
+def validate_transactions(cursor, transactions, user_id: str) -> list:
+    """
+    Checks a batch of transactions (mappings with the API field names) for
+    the given user: accounts and categories of other users are not found.
+    Returns one entry per transaction: None if valid, else the error message.
+    """
+    accounts = _owned_ids(cursor, 'mm_accounts', 'acc_id', 'acc_usr_id', user_id,
+                          [t['account_id'] for t in transactions] +
+                          [t.get('target_account_id') for t in transactions])
+    categories = _owned_ids(cursor, 'mm_categories', 'cat_id', 'cat_usr_id', user_id,
+                            [t.get('category_id') for t in transactions])
+
+    errors = []
+    for trx in transactions:
+        error = None
+        if trx['account_id'] not in accounts:
+            error = "Compte source non trouvé"
+        elif trx['type'] not in TRANSACTION_TYPES:
+            error = "Type de transaction invalide"
+        elif trx['type'] == 'transfer' and not trx.get('target_account_id'):
+            error = "Le compte destinataire est requis pour un transfert"
+        elif trx['type'] == 'transfer' and trx['target_account_id'] == trx['account_id']:
+            error = "Le compte destinataire doit être différent du compte source"
+        elif trx.get('target_account_id') and trx['target_account_id'] not in accounts:
+            error = "Compte destinataire non trouvé"
+        elif trx.get('category_id') and trx['category_id'] not in categories:
+            error = "Catégorie non trouvée"
+        else:
+            try:
+                date.fromisoformat(str(trx['date'])[:10])
+            except ValueError:
+                error = "Date invalide"
+        errors.append(error)
+    return errors
+
+
+def balance_deltas(transactions) -> dict:
+    """Returns {account_id: Decimal} net balance change of a batch."""
+    deltas = {}
+    for trx in transactions:
+        amount = Decimal(str(trx['amount']))
+        if trx['type'] == 'income':
+            deltas[trx['account_id']] = deltas.get(trx['account_id'], 0) + amount
+        elif trx['type'] == 'expense':
+            deltas[trx['account_id']] = deltas.get(trx['account_id'], 0) - amount
+        elif trx['type'] == 'transfer' and trx.get('target_account_id'):
+            deltas[trx['account_id']] = deltas.get(trx['account_id'], 0) - amount
+            deltas[trx['target_account_id']] = deltas.get(trx['target_account_id'], 0) + amount
+    return deltas
+
+
+def apply_balance_deltas(cursor, deltas: dict):
+    """One UPDATE per account, in a stable order to avoid lock-order deadlocks."""
+    for account_id in sorted(deltas):
+        if deltas[account_id]:
+            cursor.execute("UPDATE mm_accounts SET acc_balance = acc_balance + %s WHERE acc_id = %s",
+                           (deltas[account_id], account_id))
+
+
+def insert_transactions(cursor, transactions) -> list:
+    """
+    Inserts already validated transactions, updates the balances and the
+    monthly aggregates. An optional recurring_id links a transaction to its
+    recurring template and an optional import_ref records the statement
+    row it was imported from. Returns the new transaction ids, in order.
+    """
+    if not transactions:
+        return []
+
+    ids = [str(uuid.uuid4()) for _ in transactions]
+    # executemany regroupe les lignes en un seul INSERT multi-valeurs
+    cursor.executemany("""
+        INSERT INTO mm_transactions (trx_id, trx_acc_id, trx_target_acc_id, trx_cat_id, trx_rec_id,
+                                      trx_import_ref, trx_type, trx_amount, trx_description, trx_date)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, [
+        (trx_id, trx['account_id'], trx.get('target_account_id'), trx.get('category_id'),
+         trx.get('recurring_id'), trx.get('import_ref'), trx['type'], trx['amount'],
+         trx.get('description'), trx['date'])
+        for trx_id, trx in zip(ids, transactions)
+    ])
+
+    apply_balance_deltas(cursor, balance_deltas(transactions))
+    record_transactions(cursor, transactions)
+    return ids
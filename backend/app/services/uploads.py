@@ -0,0 +1,108 @@
+"""
+Content-addressed storage of uploaded images (avatars and icons).
+
+An upload is streamed to disk in chunks while its SHA-256 is computed,
+and kept once under uploads/blobs/<2 first hex>/<sha256><ext>. The public
+paths (uploads/users/..., uploads/icons/<user_id>/...) are hard links to
+that blob: identical files uploaded by many users use the disk space of
+one, and the icon directories can still be listed as before. The WebP
+renditions of a blob (see app.services.images) are stored next to it as
+<sha256>_<size>.webp. A blob and its renditions are deleted when its last
+public link is released.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Chemin vers le dossier frontend/public
+FRONTEND_PUBLIC_PATH = Path(__file__).parent.parent.parent.parent / "frontend" / "public"
+BLOBS_PATH = FRONTEND_PUBLIC_PATH / "uploads" / "blobs"
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """The upload exceeds the configured maximum size."""
+
+
+def blob_path(digest: str, ext: str) -> Path:
+    return BLOBS_PATH / digest[:2] / f"{digest}{ext}"
+
+
+def copy_upload(source, target, max_size: int, digest=None) -> int:
+    """
+    Copies a file object to another, CHUNK_SIZE bytes at a time, feeding the
+    optional hash object. Returns the size. Raises UploadTooLargeError past max_size.
+    """
+    size = 0
+    while chunk := source.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            raise UploadTooLargeError(f"Fichier trop volumineux (maximum {max_size // 1024} Ko)")
+        if digest is not None:
+            digest.update(chunk)
+        target.write(chunk)
+    return size
+
+
+def store_upload(source, ext: str, max_size: int) -> tuple:
+    """
+    Copies a file object to the blob store, CHUNK_SIZE bytes at a time.
+    Returns (digest, blob path). Raises UploadTooLargeError past max_size.
+    """
+    BLOBS_PATH.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    # Fichier temporaire dans le même système de fichiers : os.replace est atomique
+    fd, temp_name = tempfile.mkstemp(dir=BLOBS_PATH, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as temp:
+            copy_upload(source, temp, max_size, digest)
+
+        blob = blob_path(digest.hexdigest(), ext)
+        if blob.exists():
+            os.unlink(temp_name)
+        else:
+            blob.parent.mkdir(exist_ok=True)
+            os.replace(temp_name, blob)
+        return digest.hexdigest(), blob
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+
+def link_blob(blob: Path, target: Path):
+    """Publishes a blob at target (hard link, or a copy if links are not supported)."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.exists():
+        # Même nom = même contenu (le nom contient l'empreinte)
+        return
+    try:
+        os.link(blob, target)
+    except OSError:
+        shutil.copyfile(blob, target)
+
+
+def release(target: Path):
+    """Removes a published file, and its blob if no other file links to it."""
+    digest = target.stem.rsplit('_', 1)[-1]
+    blob = blob_path(digest, target.suffix)
+    target.unlink(missing_ok=True)
+    discard(blob)
+
+
+def discard(blob: Path):
+    """Deletes a blob that no public file links to, with its renditions."""
+    try:
+        if blob.stat().st_nlink > 1:
+            return
+        blob.unlink()
+    except FileNotFoundError:
+        return
+    digest = blob.stem
+    # Mêmes octets importés avec une autre extension : les rendus sont partagés
+    if not any(blob.parent.glob(f"{digest}.*")):
+        for rendition in blob.parent.glob(f"{digest}_*.webp"):
+            rendition.unlink(missing_ok=True)
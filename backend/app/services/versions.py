@@ -0,0 +1,94 @@
+"""
+Per-user data version, used as ETag of the read endpoints.
+
+mm_data_versions holds one counter per user, incremented after every
+successful write to the user's data (router dependency track_writes), or
+in the transaction of the write itself (recurring processing for the
+scheduler, batches of a streamed statement import). A read endpoint first reads
+the counter (primary key lookup): if the client already has the
+representation of this version (If-None-Match), it answers 304 without
+running its query.
+
+The counter is read before the data, so a write committed in between can
+only make the client download again, never keep a stale copy.
+
+Each row also holds a random epoch, drawn when the row is created (first
+write or first read of the user) and part of the ETag: when a user is
+deleted and created again with the same id, its counter starts over but
+the ETags cached by its clients no longer match.
+"""
+
+import secrets
+
+from fastapi import Depends, Request
+
+from app.auth import get_current_user
+from app.database import get_db
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+def new_epoch() -> str:
+    return secrets.token_hex(8)
+
+
+def data_version(cursor, user_id: str) -> tuple:
+    """
+    Current (epoch, version) of a user. The row is created at version 0 on
+    the first read, so that the epoch also covers the state before any write.
+    """
+    cursor.execute("SELECT dvr_epoch, dvr_version FROM mm_data_versions WHERE dvr_usr_id = %s", (user_id,))
+    row = cursor.fetchone()
+    if not row:
+        epoch = new_epoch()
+        # IGNORE : une lecture concurrente a pu créer la ligne (ou l'utilisateur
+        # vient d'être supprimé)
+        cursor.execute("""
+            INSERT IGNORE INTO mm_data_versions (dvr_usr_id, dvr_epoch, dvr_version) VALUES (%s, %s, 0)
+        """, (user_id, epoch))
+        if cursor.rowcount:
+            return epoch, 0
+        cursor.execute("SELECT dvr_epoch, dvr_version FROM mm_data_versions WHERE dvr_usr_id = %s", (user_id,))
+        row = cursor.fetchone()
+        if not row:
+            return epoch, 0
+    return row['dvr_epoch'], row['dvr_version']
+
+
+def bump_data_versions(cursor, user_ids):
+    """Increments the data version of the given users."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    # Ordre fixe des lignes verrouillées : pas d'interblocage entre deux lots
+    cursor.executemany("""
+        INSERT INTO mm_data_versions (dvr_usr_id, dvr_epoch, dvr_version) VALUES (%s, %s, 1)
+        ON DUPLICATE KEY UPDATE dvr_version = dvr_version + 1
+    """, [(user_id, new_epoch()) for user_id in user_ids])
+
+
+def version_etag(cursor, user_id: str, resource: str) -> str:
+    """ETag of a resource of a user, derived from the user's data version."""
+    epoch, version = data_version(cursor, user_id)
+    return f'"{resource}-{epoch}-{version}"'
+
+
+def track_writes(request: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Router dependency: bumps the caller's data version once a write request
+    has succeeded (the route raised no exception), when the route returns.
+    Routes declaring keep_data_version are skipped.
+    """
+    yield
+    if request.method not in SAFE_METHODS and not getattr(request.state, 'keep_data_version', False):
+        with get_db() as (conn, cursor):
+            bump_data_versions(cursor, [current_user['id']])
+
+
+def keep_data_version(request: Request):
+    """
+    Route dependency: track_writes does not bump the version. For POST routes
+    that only read (budget check), and for streaming routes that write after
+    returning and bump the version themselves, in the transaction of each write.
+    """
+    request.state.keep_data_version = True
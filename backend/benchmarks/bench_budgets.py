@@ -0,0 +1,139 @@
+"""
+Benchmark: nombre de requêtes et latence de la liste des budgets.
+
+Crée un utilisateur jetable avec N budgets (chaque catégorie budgétée a
+deux sous-catégories), vérifie que l'ancienne boucle N+1 et le calcul en
+une passe donnent les mêmes dépenses, les mesure, puis annule tout
+(ROLLBACK). Nécessite une base MySQL configurée.
+
+Utilisation (depuis backend/):
+    python -m benchmarks.bench_budgets
+"""
+
+import time
+import uuid
+from datetime import date
+
+from app.database import get_connection
+from app.services.budgets import list_budgets_with_spending
+from app.services.categories import closure_rows, insert_closure_rows
+
+BUDGET_COUNTS = [1, 10, 40, 100]
+REPEAT = 5
+
+
+class CountingCursor:
+    """Enveloppe un curseur et compte les requêtes exécutées."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.queries = 0
+
+    def execute(self, query, args=None):
+        self.queries += 1
+        return self._cursor.execute(query, args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def legacy_budget_spending(cursor, user_id, month):
+    """Ancienne implémentation : une CTE récursive + SUM par budget."""
+    cursor.execute("""
+        SELECT b.bgt_id as id, b.bgt_cat_id as category_id
+        FROM mm_budgets b WHERE b.bgt_usr_id = %s
+    """, (user_id,))
+    spent = {}
+    for budget in cursor.fetchall():
+        cursor.execute("""
+            WITH RECURSIVE category_tree AS (
+                SELECT cat_id FROM mm_categories WHERE cat_id = %s
+                UNION ALL
+                SELECT c.cat_id FROM mm_categories c
+                INNER JOIN category_tree ct ON c.cat_parent_id = ct.cat_id
+            )
+            SELECT COALESCE(SUM(m.mag_total), 0) as spent
+            FROM mm_monthly_aggregates m
+            JOIN mm_accounts a ON m.mag_acc_id = a.acc_id
+            WHERE a.acc_usr_id = %s
+              AND m.mag_cat_id IN (SELECT cat_id FROM category_tree)
+              AND m.mag_type = 'expense'
+              AND m.mag_month = %s
+        """, (budget['category_id'], user_id, month))
+        spent[budget['id']] = float(cursor.fetchone()['spent'])
+    return spent
+
+
+def seed_budgets(cursor, count, month):
+    """Crée un utilisateur avec `count` budgets et des dépenses sur le mois."""
+    user_id = str(uuid.uuid4())
+    cursor.execute("""
+        INSERT INTO mm_users (usr_id, usr_email, usr_password_hash, usr_first_name, usr_last_name)
+        VALUES (%s, %s, 'x', 'Bench', 'Budgets')
+    """, (user_id, f"bench-{user_id}"))
+    account_id = str(uuid.uuid4())
+    cursor.execute("""
+        INSERT INTO mm_accounts (acc_id, acc_usr_id, acc_name) VALUES (%s, %s, 'Bench')
+    """, (account_id, user_id))
+
+    created = []
+    for i in range(count):
+        parent_id = str(uuid.uuid4())
+        cursor.execute("""
+            INSERT INTO mm_categories (cat_id, cat_usr_id, cat_name, cat_type)
+            VALUES (%s, %s, %s, 'expense')
+        """, (parent_id, user_id, f"Bench {i}"))
+        created.append((parent_id, None))
+        for j in range(2):
+            child_id = str(uuid.uuid4())
+            cursor.execute("""
+                INSERT INTO mm_categories (cat_id, cat_usr_id, cat_parent_id, cat_name, cat_type)
+                VALUES (%s, %s, %s, %s, 'expense')
+            """, (child_id, user_id, parent_id, f"Bench {i}.{j}"))
+            created.append((child_id, parent_id))
+            cursor.execute("""
+                INSERT INTO mm_monthly_aggregates (mag_acc_id, mag_cat_id, mag_month, mag_type, mag_total, mag_count)
+                VALUES (%s, %s, %s, 'expense', 42.50, 3)
+            """, (account_id, child_id, month))
+        cursor.execute("""
+            INSERT INTO mm_budgets (bgt_id, bgt_usr_id, bgt_cat_id, bgt_amount)
+            VALUES (%s, %s, %s, 100)
+        """, (str(uuid.uuid4()), user_id, parent_id))
+
+    # Sous-arbres lus par list_budgets_with_spending
+    insert_closure_rows(cursor, closure_rows(created))
+    return user_id
+
+
+def measure(func, cursor, *args):
+    counting = CountingCursor(cursor)
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(counting, *args)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / REPEAT
+    return counting.queries // REPEAT, elapsed_ms
+
+
+def main():
+    month = date.today().replace(day=1)
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        print(f"{'budgets':>8} | {'requêtes (1 passe)':>18} | {'ms':>8} | {'requêtes (N+1)':>14} | {'ms':>8}")
+        for count in BUDGET_COUNTS:
+            user_id = seed_budgets(cursor, count, month)
+            # Les deux calculs doivent donner les mêmes dépenses (2 x 42,50 par budget)
+            spent = {b['id']: b['spent'] for b in list_budgets_with_spending(cursor, user_id, month)}
+            legacy_spent = legacy_budget_spending(cursor, user_id, month)
+            assert spent == legacy_spent, "dépenses différentes entre les deux calculs"
+            assert all(amount == 85.0 for amount in spent.values()), "dépenses inattendues"
+            queries, ms = measure(list_budgets_with_spending, cursor, user_id, month)
+            legacy_queries, legacy_ms = measure(legacy_budget_spending, cursor, user_id, month)
+            print(f"{count:>8} | {queries:>18} | {ms:>8.2f} | {legacy_queries:>14} | {legacy_ms:>8.2f}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
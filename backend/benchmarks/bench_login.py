@@ -0,0 +1,70 @@
+"""
+Benchmark: débit des connexions et blocage de la boucle d'événements.
+
+Simule une rafale de N connexions simultanées (vérification bcrypt) dans
+une boucle asyncio, avec bcrypt exécuté dans la boucle (comme un handler
+`async def` appelant verify_password) puis dans le pool bcrypt. Une tâche
+témoin mesure le retard maximal de la boucle, c'est-à-dire le temps
+pendant lequel les autres requêtes du worker sont bloquées. Ne nécessite
+pas de base de données.
+
+Utilisation (depuis backend/):
+    python -m benchmarks.bench_login
+"""
+
+import asyncio
+import time
+
+from app.auth import (
+    BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, hash_password, password_executor, verify_password, verify_password_async,
+)
+
+CONCURRENCY = [1, 4, 16, 64]
+PASSWORD = "mot-de-passe-de-test"
+TICK = 0.005
+
+
+async def inline_login(password_hash):
+    return verify_password(PASSWORD, password_hash)
+
+
+async def pooled_login(password_hash):
+    return await verify_password_async(PASSWORD, password_hash)
+
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    """Mesure l'écart entre le réveil prévu et le réveil réel de la boucle."""
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - expected)
+
+
+async def burst(login, password_hash, count: int) -> tuple:
+    stop = asyncio.Event()
+    lags = []
+    watcher = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(TICK)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login(password_hash) for _ in range(count)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await watcher
+    return count / elapsed, max(lags, default=0) * 1000
+
+
+async def main():
+    password_hash = hash_password(PASSWORD)
+    print(f"bcrypt rounds={BCRYPT_ROUNDS}, threads bcrypt={PASSWORD_HASH_WORKERS}")
+    print(f"{'connexions':>10} | {'boucle /s':>10} | {'retard max ms':>13} | {'pool /s':>8} | {'retard max ms':>13}")
+    for count in CONCURRENCY:
+        inline_rate, inline_lag = await burst(inline_login, password_hash, count)
+        pooled_rate, pooled_lag = await burst(pooled_login, password_hash, count)
+        print(f"{count:>10} | {inline_rate:>10.1f} | {inline_lag:>13.1f} | {pooled_rate:>8.1f} | {pooled_lag:>13.1f}")
+    password_executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Benchmark: nombre de requêtes et latence de l'inscription (partie base de données).
+
+Inscrit N utilisateurs jetables avec l'ancienne création des catégories
+(un INSERT par catégorie) puis avec le modèle pré-calculé (un INSERT
+multi-lignes pour les parents, un pour les enfants, un pour la fermeture),
+puis annule tout (ROLLBACK). Le hachage bcrypt, identique dans les deux
+cas, n'est pas mesuré. Nécessite une base MySQL configurée.
+
+Utilisation (depuis backend/):
+    python -m benchmarks.bench_registration
+"""
+
+import time
+import uuid
+
+from app.database import get_connection
+from app.services.categories import closure_rows, insert_closure_rows
+from app.services.category_template import DEFAULT_CATEGORIES, provision_default_categories
+
+REGISTRATIONS = 50
+
+
+class CountingCursor:
+    """Enveloppe un curseur et compte les requêtes exécutées."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.queries = 0
+
+    def execute(self, query, args=None):
+        self.queries += 1
+        return self._cursor.execute(query, args)
+
+    def executemany(self, query, args):
+        # Un INSERT ... VALUES regroupé en une seule requête multi-lignes
+        self.queries += 1
+        return self._cursor.executemany(query, args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def legacy_default_categories(cursor, user_id):
+    """Ancienne implémentation : un INSERT par catégorie."""
+    created = []
+    for cat_type, categories in DEFAULT_CATEGORIES.items():
+        for parent_name, parent_data in categories.items():
+            parent_id = str(uuid.uuid4())
+            cursor.execute("""
+                INSERT INTO mm_categories (cat_id, cat_usr_id, cat_parent_id, cat_name, cat_type, cat_icon, cat_color, cat_is_default)
+                VALUES (%s, %s, NULL, %s, %s, %s, %s, FALSE)
+            """, (parent_id, user_id, parent_name, cat_type, parent_data["icon"], parent_data["color"]))
+            created.append((parent_id, None))
+            for child_name in parent_data["children"]:
+                child_id = str(uuid.uuid4())
+                cursor.execute("""
+                    INSERT INTO mm_categories (cat_id, cat_usr_id, cat_parent_id, cat_name, cat_type, cat_icon, cat_color, cat_is_default)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, FALSE)
+                """, (child_id, user_id, parent_id, child_name, cat_type, parent_data["icon"], parent_data["color"]))
+                created.append((child_id, parent_id))
+    insert_closure_rows(cursor, closure_rows(created))
+
+
+def register(cursor, create_categories):
+    """Partie base de données de POST /auth/register."""
+    user_id = str(uuid.uuid4())
+    cursor.execute("SELECT usr_id FROM mm_users WHERE usr_email = %s", (f"bench-{user_id}",))
+    cursor.fetchone()
+    cursor.execute("""
+        INSERT INTO mm_users (usr_id, usr_email, usr_password_hash, usr_first_name, usr_last_name)
+        VALUES (%s, %s, 'x', 'Bench', 'Inscription')
+    """, (user_id, f"bench-{user_id}"))
+    create_categories(cursor, user_id)
+
+
+def measure(create_categories, cursor):
+    counting = CountingCursor(cursor)
+    timings = []
+    for _ in range(REGISTRATIONS):
+        start = time.perf_counter()
+        register(counting, create_categories)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return counting.queries // REGISTRATIONS, sum(timings) / len(timings), timings[len(timings) * 95 // 100]
+
+
+def main():
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        print(f"{'création':>14} | {'requêtes':>8} | {'ms moy.':>8} | {'ms p95':>8}")
+        for label, create_categories in (
+            ("une par ligne", legacy_default_categories),
+            ("modèle", provision_default_categories),
+        ):
+            queries, mean_ms, p95_ms = measure(create_categories, cursor)
+            print(f"{label:>14} | {queries:>8} | {mean_ms:>8.2f} | {p95_ms:>8.2f}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: sérialisation d'une réponse de GET /users/{id}/transactions.
+
+Construit une page de 5 000 transactions ayant la forme des lignes
+renvoyées par DictCursor (Decimal, date, datetime, NULL), puis mesure la
+sérialisation faite auparavant par FastAPI (jsonable_encoder puis
+JSONResponse) et celle de FastJSONResponse (orjson en une passe).
+Vérifie aussi que les deux corps JSON décodés sont identiques. Ne
+nécessite pas de base de données.
+
+Utilisation (depuis backend/):
+    python -m benchmarks.bench_serialization
+"""
+
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.responses import FastJSONResponse
+
+ROWS = 5000
+RUNS = 30
+
+
+def transaction_rows(count: int) -> list:
+    """Lignes au format de USER_TRANSACTIONS_SELECT."""
+    rng = random.Random(42)
+    accounts = [(str(uuid.uuid4()), name) for name in ("Compte courant", "Livret A", "Épargne")]
+    categories = [(str(uuid.uuid4()), name) for name in ("Courses", "Loyer", "Salaire", "Restaurants", "Transport")]
+    start = datetime(2024, 1, 1, 8, 30)
+    rows = []
+    for i in range(count):
+        account_id, account_name = rng.choice(accounts)
+        category_id, category_name = rng.choice(categories)
+        transfer = rng.random() < 0.1
+        created_at = start + timedelta(minutes=97 * i)
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "account_id": account_id,
+            "target_account_id": accounts[0][0] if transfer else None,
+            "category_id": None if transfer else category_id,
+            "recurring_id": None,
+            "type": "transfer" if transfer else rng.choice(("expense", "income")),
+            "amount": Decimal(rng.randint(100, 250000)) / 100,
+            "description": f"Opération {i}",
+            "date": created_at.date(),
+            "created_at": created_at,
+            "category_name": None if transfer else category_name,
+            "category_icon": "/default/icons/cart.png",
+            "category_color": "#6366f1",
+            "account_name": account_name,
+            "target_account_name": accounts[0][1] if transfer else None,
+        })
+    return rows
+
+
+def legacy_render(payload) -> bytes:
+    """Chemin par défaut de FastAPI pour une route renvoyant un dict."""
+    return JSONResponse(content=jsonable_encoder(payload)).body
+
+
+def fast_render(payload) -> bytes:
+    return FastJSONResponse(payload).body
+
+
+def measure(render, payload) -> tuple:
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        body = render(payload)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return sum(timings) / len(timings), timings[len(timings) * 95 // 100], len(body)
+
+
+def main():
+    payload = {"transactions": transaction_rows(ROWS), "next_cursor": "MjAyNC0wMS0wMXwx"}
+    assert json.loads(legacy_render(payload)) == json.loads(fast_render(payload)), "corps JSON différents"
+
+    print(f"{ROWS} transactions, {RUNS} sérialisations")
+    print(f"{'sérialisation':>24} | {'ms moy.':>8} | {'ms p95':>8} | {'octets':>9}")
+    for label, render in (
+        ("jsonable_encoder + json", legacy_render),
+        ("orjson", fast_render),
+    ):
+        mean_ms, p95_ms, size = measure(render, payload)
+        print(f"{label:>24} | {mean_ms:>8.2f} | {p95_ms:>8.2f} | {size:>9}")
+
+
+if __name__ == "__main__":
+    main()
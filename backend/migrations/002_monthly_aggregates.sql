@@ -0,0 +1,32 @@
+-- =============================================================================
+-- Migration 002: Agrégats mensuels
+-- Crée la table mm_monthly_aggregates et la remplit depuis mm_transactions
+-- Ensuite maintenue par l'API (reconstruction: python -m app.rebuild)
+-- =============================================================================
+
+USE money_manager;
+
+CREATE TABLE IF NOT EXISTS mm_monthly_aggregates (
+    mag_acc_id CHAR(36) NOT NULL,
+    mag_cat_id CHAR(36) NOT NULL DEFAULT '',
+    mag_month DATE NOT NULL,
+    mag_type ENUM('income', 'expense', 'transfer') NOT NULL,
+    mag_total DECIMAL(15, 2) NOT NULL DEFAULT 0.00,
+    mag_count INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (mag_acc_id, mag_cat_id, mag_month, mag_type),
+    FOREIGN KEY (mag_acc_id) REFERENCES mm_accounts(acc_id) ON DELETE CASCADE,
+    INDEX idx_mag_cat_month (mag_cat_id, mag_month, mag_type)
+);
+
+DELETE FROM mm_monthly_aggregates;
+
+INSERT INTO mm_monthly_aggregates (mag_acc_id, mag_cat_id, mag_month, mag_type, mag_total, mag_count)
+SELECT trx_acc_id, COALESCE(trx_cat_id, ''),
+       trx_date - INTERVAL (DAY(trx_date) - 1) DAY,
+       trx_type, SUM(trx_amount), COUNT(*)
+FROM mm_transactions
+GROUP BY trx_acc_id, COALESCE(trx_cat_id, ''),
+         trx_date - INTERVAL (DAY(trx_date) - 1) DAY, trx_type;
+
+SELECT 'Migration 002 terminée avec succès' AS status;
@@ -0,0 +1,33 @@
+-- =============================================================================
+-- Migration 003: Table de fermeture des catégories
+-- Crée la table mm_category_closure et la remplit depuis cat_parent_id
+-- Ensuite maintenue par l'API (reconstruction: python -m app.rebuild)
+-- =============================================================================
+
+USE money_manager;
+
+CREATE TABLE IF NOT EXISTS mm_category_closure (
+    clo_ancestor_id CHAR(36) NOT NULL,
+    clo_descendant_id CHAR(36) NOT NULL,
+    clo_depth INT NOT NULL,
+
+    PRIMARY KEY (clo_ancestor_id, clo_descendant_id),
+    FOREIGN KEY (clo_ancestor_id) REFERENCES mm_categories(cat_id) ON DELETE CASCADE,
+    FOREIGN KEY (clo_descendant_id) REFERENCES mm_categories(cat_id) ON DELETE CASCADE,
+    INDEX idx_clo_descendant (clo_descendant_id, clo_depth)
+);
+
+DELETE FROM mm_category_closure;
+
+INSERT INTO mm_category_closure (clo_ancestor_id, clo_descendant_id, clo_depth)
+WITH RECURSIVE tree AS (
+    SELECT cat_id AS ancestor_id, cat_id AS descendant_id, 0 AS depth
+    FROM mm_categories
+    UNION ALL
+    SELECT t.ancestor_id, c.cat_id, t.depth + 1
+    FROM mm_categories c
+    INNER JOIN tree t ON c.cat_parent_id = t.descendant_id
+)
+SELECT ancestor_id, descendant_id, depth FROM tree;
+
+SELECT 'Migration 003 terminée avec succès' AS status;
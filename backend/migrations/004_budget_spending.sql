@@ -0,0 +1,28 @@
+-- =============================================================================
+-- Migration 004: Compteurs de dépenses des budgets
+-- Crée la table mm_budget_spending et la remplit depuis les agrégats mensuels
+-- Nécessite les migrations 002 et 003 (agrégats, fermeture des catégories)
+-- =============================================================================
+
+USE money_manager;
+
+CREATE TABLE IF NOT EXISTS mm_budget_spending (
+    bsp_bgt_id CHAR(36) NOT NULL,
+    bsp_month DATE NOT NULL,
+    bsp_spent DECIMAL(15, 2) NOT NULL DEFAULT 0.00,
+
+    PRIMARY KEY (bsp_bgt_id, bsp_month),
+    FOREIGN KEY (bsp_bgt_id) REFERENCES mm_budgets(bgt_id) ON DELETE CASCADE
+);
+
+DELETE FROM mm_budget_spending;
+
+INSERT INTO mm_budget_spending (bsp_bgt_id, bsp_month, bsp_spent)
+SELECT b.bgt_id, m.mag_month, SUM(m.mag_total)
+FROM mm_budgets b
+JOIN mm_category_closure cc ON cc.clo_ancestor_id = b.bgt_cat_id
+JOIN mm_monthly_aggregates m ON m.mag_cat_id = cc.clo_descendant_id AND m.mag_type = 'expense'
+JOIN mm_accounts a ON a.acc_id = m.mag_acc_id AND a.acc_usr_id = b.bgt_usr_id
+GROUP BY b.bgt_id, m.mag_month;
+
+SELECT 'Migration 004 terminée avec succès' AS status;
@@ -0,0 +1,19 @@
+-- =============================================================================
+-- Migration 005: Index de pagination par curseur des transactions
+-- Les listes de transactions sont triées par (trx_date, created_at, trx_id)
+-- décroissant et paginées à partir de la dernière ligne renvoyée.
+-- Les index composites remplacent les index simples sur les comptes
+-- (ils servent aussi aux clés étrangères).
+-- =============================================================================
+
+USE money_manager;
+
+ALTER TABLE mm_transactions
+    ADD INDEX idx_trx_acc_seek (trx_acc_id, trx_date, created_at, trx_id),
+    ADD INDEX idx_trx_target_acc_seek (trx_target_acc_id, trx_date, created_at, trx_id);
+
+ALTER TABLE mm_transactions
+    DROP INDEX idx_trx_acc_id,
+    DROP INDEX idx_trx_target_acc_id;
+
+SELECT 'Migration 005 terminée avec succès' AS status;
@@ -0,0 +1,13 @@
+-- =============================================================================
+-- Migration 006: Import de relevés bancaires
+-- Ajoute trx_import_ref (empreinte de la ligne de relevé importée) pour ne pas
+-- importer deux fois la même opération dans un compte
+-- =============================================================================
+
+USE money_manager;
+
+ALTER TABLE mm_transactions
+    ADD COLUMN trx_import_ref CHAR(40) DEFAULT NULL AFTER trx_rec_id,
+    ADD UNIQUE KEY unique_trx_import_ref (trx_acc_id, trx_import_ref);
+
+SELECT 'Migration 006 terminée avec succès' AS status;
@@ -0,0 +1,14 @@
+-- =============================================================================
+-- Migration 007: Index des récurrences dues
+-- Le planificateur cherche les récurrences actives dont la prochaine
+-- occurrence est passée, triées par (rec_next_occurrence, rec_id)
+-- =============================================================================
+
+USE money_manager;
+
+ALTER TABLE mm_recurring
+    ADD INDEX idx_rec_due (rec_is_active, rec_next_occurrence, rec_id),
+    DROP INDEX idx_rec_next_occurrence,
+    DROP INDEX idx_rec_is_active;
+
+SELECT 'Migration 007 terminée avec succès' AS status;
@@ -0,0 +1,27 @@
+-- =============================================================================
+-- Migration 008: Unicité des occurrences de récurrence
+-- Une récurrence ne génère qu'une transaction par date : deux traitements
+-- concurrents ne peuvent plus créer de doublon.
+-- Les doublons existants sont détachés de leur récurrence (trx_rec_id NULL)
+-- sans être supprimés, les soldes restent inchangés.
+-- =============================================================================
+
+USE money_manager;
+
+UPDATE mm_transactions t
+JOIN (
+    SELECT trx_id FROM (
+        SELECT trx_id,
+               ROW_NUMBER() OVER (PARTITION BY trx_rec_id, trx_date ORDER BY created_at, trx_id) AS occurrence_rank
+        FROM mm_transactions
+        WHERE trx_rec_id IS NOT NULL
+    ) ranked
+    WHERE occurrence_rank > 1
+) duplicates ON duplicates.trx_id = t.trx_id
+SET t.trx_rec_id = NULL;
+
+ALTER TABLE mm_transactions
+    ADD UNIQUE KEY unique_trx_rec_date (trx_rec_id, trx_date),
+    DROP INDEX idx_trx_rec_id;
+
+SELECT 'Migration 008 terminée avec succès' AS status;
@@ -0,0 +1,17 @@
+-- =============================================================================
+-- Migration 009: Version des données par utilisateur
+-- Compteur incrémenté par l'API à chaque écriture dans les données d'un
+-- utilisateur, utilisé comme ETag des lectures (catégories, comptes,
+-- budgets, récurrences). Aucune ligne = version 0.
+-- =============================================================================
+
+USE money_manager;
+
+CREATE TABLE IF NOT EXISTS mm_data_versions (
+    dvr_usr_id CHAR(36) PRIMARY KEY,
+    dvr_version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+
+    FOREIGN KEY (dvr_usr_id) REFERENCES mm_users(usr_id) ON DELETE CASCADE
+);
+
+SELECT 'Migration 009 terminée avec succès' AS status;
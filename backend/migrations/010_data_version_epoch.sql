@@ -0,0 +1,15 @@
+-- =============================================================================
+-- Migration 010: Époque de la version des données
+-- Ajoute dvr_epoch, tirée au hasard à la création de la ligne et incluse dans
+-- l'ETag : un utilisateur supprimé puis recréé (même usr_id) repart à la
+-- version 0 sans que les ETag déjà en cache chez ses clients ne correspondent
+-- =============================================================================
+
+USE money_manager;
+
+ALTER TABLE mm_data_versions
+    ADD COLUMN dvr_epoch CHAR(16) NOT NULL DEFAULT '' AFTER dvr_usr_id;
+
+UPDATE mm_data_versions SET dvr_epoch = LEFT(MD5(RANDOM_BYTES(16)), 16);
+
+SELECT 'Migration 010 terminée avec succès' AS status;
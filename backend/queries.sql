@@ -483,13 +483,16 @@ WHERE `usr_id` = 'uuid-utilisateur';
 -- =============================================================================
 
 -- Trouver les transactions recurrentes a traiter aujourd'hui
+-- (verrouillees pour le traitement, les lignes deja prises par un autre worker sont ignorees)
 SELECT `r`.`rec_id`, `r`.`rec_acc_id`, `r`.`rec_cat_id`, `r`.`rec_type`, `r`.`rec_amount`,
        `r`.`rec_description`, `r`.`rec_frequency`, `r`.`rec_next_occurrence`, `r`.`rec_end_date`,
        `r`.`rec_occurrences_limit`, `r`.`rec_occurrences_count`
 FROM `mm_recurring` `r`
 WHERE `r`.`rec_usr_id` = 'uuid-utilisateur'
   AND `r`.`rec_is_active` = TRUE
-  AND `r`.`rec_next_occurrence` <= CURDATE();
+  AND `r`.`rec_next_occurrence` <= CURDATE()
+ORDER BY `r`.`rec_id`
+FOR UPDATE SKIP LOCKED;
 
 -- Generer une transaction a partir d'une recurrence
 INSERT INTO `mm_transactions` (`trx_id`, `trx_acc_id`, `trx_cat_id`, `trx_rec_id`,
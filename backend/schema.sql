@@ -75,6 +75,23 @@ CREATE TABLE IF NOT EXISTS mm_categories (
     INDEX idx_cat_parent_id (cat_parent_id)
 );
 
+-- =============================================================================
+-- Table: mm_category_closure (Category Hierarchy Closure)
+-- One row per (ancestor, descendant) pair, including (category, category) at depth 0
+-- Maintained by the API alongside cat_parent_id (reconstruction: python -m app.rebuild)
+-- Subtree: WHERE clo_ancestor_id = ?  /  Ancestors: WHERE clo_descendant_id = ?
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS mm_category_closure (
+    clo_ancestor_id CHAR(36) NOT NULL,
+    clo_descendant_id CHAR(36) NOT NULL,
+    clo_depth INT NOT NULL,
+
+    PRIMARY KEY (clo_ancestor_id, clo_descendant_id),
+    FOREIGN KEY (clo_ancestor_id) REFERENCES mm_categories(cat_id) ON DELETE CASCADE,
+    FOREIGN KEY (clo_descendant_id) REFERENCES mm_categories(cat_id) ON DELETE CASCADE,
+    INDEX idx_clo_descendant (clo_descendant_id, clo_depth)
+);
+
 -- =============================================================================
 -- Table: mm_recurring (Recurring Transactions)
 -- Templates for repeating income/expenses (salary, rent, subscriptions)
@@ -102,15 +119,15 @@ CREATE TABLE IF NOT EXISTS mm_recurring (
     FOREIGN KEY (rec_acc_id) REFERENCES mm_accounts(acc_id) ON DELETE CASCADE,
     FOREIGN KEY (rec_cat_id) REFERENCES mm_categories(cat_id) ON DELETE SET NULL,
     INDEX idx_rec_usr_id (rec_usr_id),
-    INDEX idx_rec_next_occurrence (rec_next_occurrence),
-    INDEX idx_rec_is_active (rec_is_active)
+    INDEX idx_rec_due (rec_is_active, rec_next_occurrence, rec_id)
 );
 
 -- =============================================================================
 -- Table: mm_transactions (Transactions)
 -- Records all financial operations (expenses, income, transfers)
 -- trx_target_acc_id: used only for transfers between accounts
--- trx_rec_id: link to source recurring transaction (if applicable)
+-- trx_rec_id: link to source recurring transaction (if applicable), one transaction per occurrence date
+-- trx_import_ref: fingerprint of the bank statement row it was imported from (dedupe)
 -- =============================================================================
 CREATE TABLE IF NOT EXISTS mm_transactions (
     trx_id CHAR(36) PRIMARY KEY,
@@ -118,6 +135,7 @@ CREATE TABLE IF NOT EXISTS mm_transactions (
     trx_target_acc_id CHAR(36) DEFAULT NULL,
     trx_cat_id CHAR(36),
     trx_rec_id CHAR(36) DEFAULT NULL,
+    trx_import_ref CHAR(40) DEFAULT NULL,
     trx_type ENUM('income', 'expense', 'transfer') NOT NULL,
     trx_amount DECIMAL(15, 2) NOT NULL,
     trx_description VARCHAR(255),
@@ -129,11 +147,32 @@ CREATE TABLE IF NOT EXISTS mm_transactions (
     FOREIGN KEY (trx_target_acc_id) REFERENCES mm_accounts(acc_id) ON DELETE SET NULL,
     FOREIGN KEY (trx_cat_id) REFERENCES mm_categories(cat_id) ON DELETE SET NULL,
     FOREIGN KEY (trx_rec_id) REFERENCES mm_recurring(rec_id) ON DELETE SET NULL,
-    INDEX idx_trx_acc_id (trx_acc_id),
-    INDEX idx_trx_target_acc_id (trx_target_acc_id),
+    INDEX idx_trx_acc_seek (trx_acc_id, trx_date, created_at, trx_id),
+    INDEX idx_trx_target_acc_seek (trx_target_acc_id, trx_date, created_at, trx_id),
     INDEX idx_trx_date (trx_date),
     INDEX idx_trx_type (trx_type),
-    INDEX idx_trx_rec_id (trx_rec_id)
+    UNIQUE KEY unique_trx_rec_date (trx_rec_id, trx_date),
+    UNIQUE KEY unique_trx_import_ref (trx_acc_id, trx_import_ref)
+);
+
+-- =============================================================================
+-- Table: mm_monthly_aggregates (Monthly Totals per Account and Category)
+-- Materialized SUM/COUNT of mm_transactions per account x category x month x type
+-- Maintained by the API in the same DB transaction as every transaction write
+-- mag_cat_id: '' for uncategorized transactions (part of the primary key)
+-- mag_month: first day of the month
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS mm_monthly_aggregates (
+    mag_acc_id CHAR(36) NOT NULL,
+    mag_cat_id CHAR(36) NOT NULL DEFAULT '',
+    mag_month DATE NOT NULL,
+    mag_type ENUM('income', 'expense', 'transfer') NOT NULL,
+    mag_total DECIMAL(15, 2) NOT NULL DEFAULT 0.00,
+    mag_count INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (mag_acc_id, mag_cat_id, mag_month, mag_type),
+    FOREIGN KEY (mag_acc_id) REFERENCES mm_accounts(acc_id) ON DELETE CASCADE,
+    INDEX idx_mag_cat_month (mag_cat_id, mag_month, mag_type)
 );
 
 -- =============================================================================
@@ -162,6 +201,21 @@ CREATE TABLE IF NOT EXISTS mm_budgets (
     INDEX idx_bgt_display_order (bgt_display_order)
 );
 
+-- =============================================================================
+-- Table: mm_budget_spending (Monthly Spending Counters per Budget)
+-- Running total of the expenses in the budget category and its descendants
+-- Maintained by the API with mm_monthly_aggregates (reconstruction: python -m app.rebuild)
+-- bsp_month: first day of the month
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS mm_budget_spending (
+    bsp_bgt_id CHAR(36) NOT NULL,
+    bsp_month DATE NOT NULL,
+    bsp_spent DECIMAL(15, 2) NOT NULL DEFAULT 0.00,
+
+    PRIMARY KEY (bsp_bgt_id, bsp_month),
+    FOREIGN KEY (bsp_bgt_id) REFERENCES mm_budgets(bgt_id) ON DELETE CASCADE
+);
+
 -- =============================================================================
 -- Table: mm_advances (Advances awaiting reimbursement)
 -- Tracks money lent to others or borrowed from others
@@ -194,10 +248,26 @@ CREATE TABLE IF NOT EXISTS mm_advances (
     INDEX idx_adv_date (adv_date)
 );
 
+-- =============================================================================
+-- Table: mm_data_versions (Per-User Data Version)
+-- Incremented by the API after every write to the user's data
+-- Used as ETag of the read endpoints (categories, accounts, budgets, recurring)
+-- dvr_epoch: random, drawn when the row is created, so an ETag is never
+-- reused after the row is deleted (user deleted and created again)
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS mm_data_versions (
+    dvr_usr_id CHAR(36) PRIMARY KEY,
+    dvr_epoch CHAR(16) NOT NULL DEFAULT '',
+    dvr_version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+
+    FOREIGN KEY (dvr_usr_id) REFERENCES mm_users(usr_id) ON DELETE CASCADE
+);
+
 -- =============================================================================
 -- Procédure: create_default_categories_for_user
 -- Crée les catégories par défaut avec sous-catégories pour un nouvel utilisateur
--- Appelée automatiquement lors de l'inscription d'un utilisateur
+-- Utilisée par seed.sql ; l'API (inscription, réinitialisation) utilise le modèle
+-- de app/services/category_template.py
 -- =============================================================================
 DELIMITER //
 
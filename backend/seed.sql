@@ -1102,3 +1102,41 @@ FROM mm_advances
 WHERE adv_usr_id = @user_id
 GROUP BY adv_direction, adv_status
 ORDER BY adv_direction, adv_status;
+
+-- =============================================================================
+-- DONNEES DERIVEES
+-- Tables maintenues par l'API, remplies ici car le seed écrit directement en SQL
+-- =============================================================================
+
+-- Fermeture de la hiérarchie des catégories (ancêtre x descendant)
+INSERT INTO mm_category_closure (clo_ancestor_id, clo_descendant_id, clo_depth)
+WITH RECURSIVE tree AS (
+    SELECT cat_id AS ancestor_id, cat_id AS descendant_id, 0 AS depth
+    FROM mm_categories WHERE cat_usr_id = @user_id
+    UNION ALL
+    SELECT t.ancestor_id, c.cat_id, t.depth + 1
+    FROM mm_categories c
+    INNER JOIN tree t ON c.cat_parent_id = t.descendant_id
+)
+SELECT ancestor_id, descendant_id, depth FROM tree;
+
+-- Agrégats mensuels (compte x catégorie x mois x type)
+INSERT INTO mm_monthly_aggregates (mag_acc_id, mag_cat_id, mag_month, mag_type, mag_total, mag_count)
+SELECT t.trx_acc_id, COALESCE(t.trx_cat_id, ''),
+       t.trx_date - INTERVAL (DAY(t.trx_date) - 1) DAY,
+       t.trx_type, SUM(t.trx_amount), COUNT(*)
+FROM mm_transactions t
+JOIN mm_accounts a ON t.trx_acc_id = a.acc_id
+WHERE a.acc_usr_id = @user_id
+GROUP BY t.trx_acc_id, COALESCE(t.trx_cat_id, ''),
+         t.trx_date - INTERVAL (DAY(t.trx_date) - 1) DAY, t.trx_type;
+
+-- Compteurs mensuels des budgets (catégorie du budget et ses descendantes)
+INSERT INTO mm_budget_spending (bsp_bgt_id, bsp_month, bsp_spent)
+SELECT b.bgt_id, m.mag_month, SUM(m.mag_total)
+FROM mm_budgets b
+JOIN mm_category_closure cc ON cc.clo_ancestor_id = b.bgt_cat_id
+JOIN mm_monthly_aggregates m ON m.mag_cat_id = cc.clo_descendant_id AND m.mag_type = 'expense'
+JOIN mm_accounts a ON a.acc_id = m.mag_acc_id AND a.acc_usr_id = b.bgt_usr_id
+WHERE b.bgt_usr_id = @user_id
+GROUP BY b.bgt_id, m.mag_month;
@@ -108,6 +108,17 @@ export const accountsAPI = {
 
   delete: (id) =>
     api.delete(`/accounts/${id}`),
+
+  // Réponse NDJSON : une ligne de progression par lot importé
+  importStatement: (accountId, file, params = {}) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post(`/accounts/${accountId}/import`, formData, {
+      params,
+      headers: { 'Content-Type': 'multipart/form-data' },
+      responseType: 'text',
+    });
+  },
 };
 
 // =============================================================================
@@ -121,12 +132,18 @@ export const transactionsAPI = {
   getByUser: (userId, params = {}) =>
     api.get(`/users/${userId}/transactions`, { params }),
 
+  exportByUser: (userId, params = {}) =>
+    api.get(`/users/${userId}/transactions/export`, { params, responseType: 'blob' }),
+
   getById: (id) =>
     api.get(`/transactions/${id}`),
 
   create: (data) =>
     api.post('/transactions', data),
 
+  createBatch: (transactions, allowPartial = false) =>
+    api.post('/transactions/batch', { transactions, allow_partial: allowPartial }),
+
   update: (id, data) =>
     api.put(`/transactions/${id}`, data),
 
@@ -171,6 +188,9 @@ export const recurringAPI = {
 
   delete: (id) =>
     api.delete(`/recurring/${id}`),
+
+  getProjection: (userId, params = {}) =>
+    api.get(`/users/${userId}/recurring/projection`, { params }),
 };
 
 // =============================================================================
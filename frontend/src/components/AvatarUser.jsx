@@ -1,18 +1,22 @@
 import clsx from 'clsx'
 import PersonIcon from '@mui/icons-material/Person'
+import { renditionSrcSet } from '../utils/images'
 
 const sizeConfig = {
   small: {
     container: 'w-8 h-8 text-xs',
-    icon: 'text-base'
+    icon: 'text-base',
+    pixels: '32px'
   },
   medium: {
     container: 'w-10 h-10 text-sm',
-    icon: 'text-lg'
+    icon: 'text-lg',
+    pixels: '40px'
   },
   large: {
     container: 'w-24 h-24 text-2xl',
-    icon: 'text-5xl'
+    icon: 'text-5xl',
+    pixels: '96px'
   }
 }
 
@@ -29,6 +33,8 @@ function AvatarUser({ user, size = 'medium' }) {
     return (
       <img
         src={user.avatar_url}
+        srcSet={renditionSrcSet(user.avatar_renditions)}
+        sizes={config.pixels}
         alt="Avatar"
         className={clsx(baseClasses, 'object-cover')}
       />
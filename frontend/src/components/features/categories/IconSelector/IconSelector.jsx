@@ -1,6 +1,7 @@
 import clsx from 'clsx'
 import CloudUploadIcon from '@mui/icons-material/CloudUpload'
 import DeleteOutlineIcon from '@mui/icons-material/DeleteOutline'
+import { renditionSrcSet } from '../../../../utils/images'
 
 /**
  * Sélecteur d'icônes avec upload
@@ -46,7 +47,13 @@ function IconSelector({
               onClick={() => onSelect(icon.path)}
               title={icon.name}
             >
-              <img src={icon.path} alt={icon.name} className="w-6 h-6 object-contain" />
+              <img
+                src={icon.path}
+                srcSet={renditionSrcSet(icon.renditions)}
+                sizes="24px"
+                alt={icon.name}
+                className="w-6 h-6 object-contain"
+              />
             </button>
           ))}
         </div>
@@ -73,7 +80,13 @@ function IconSelector({
                 onClick={() => onSelect(icon.path)}
                 title={icon.name}
               >
-                <img src={icon.path} alt={icon.name} className="w-6 h-6 object-contain" />
+                <img
+                  src={icon.path}
+                  srcSet={renditionSrcSet(icon.renditions)}
+                  sizes="24px"
+                  alt={icon.name}
+                  className="w-6 h-6 object-contain"
+                />
               </button>
             ))}
           </div>
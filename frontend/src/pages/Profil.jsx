@@ -25,6 +25,7 @@ function Profil() {
     first_name: user?.first_name || '',
     email: user?.email || '',
     avatar_url: user?.avatar_url || '',
+    avatar_renditions: user?.avatar_renditions || null,
     avatar_color: user?.avatar_color || '#6366f1',
   })
 
@@ -119,8 +120,8 @@ function Profil() {
       return
     }
 
-    if (file.size > 5 * 1024 * 1024) {
-      setMessage({ type: 'error', text: 'Image trop volumineuse (max 5MB)' })
+    if (file.size > 16 * 1024 * 1024) {
+      setMessage({ type: 'error', text: 'Image trop volumineuse (max 16MB)' })
       return
     }
 
@@ -139,8 +140,9 @@ function Profil() {
       const updatedUser = { ...user, ...response.data.user }
       localStorage.setItem('user', JSON.stringify(updatedUser))
 
-      setUserData(prev => ({ ...prev, avatar_url: response.data.user.avatar_url }))
-      setEditData(prev => ({ ...prev, avatar_url: response.data.user.avatar_url }))
+      const { avatar_url, avatar_renditions } = response.data.user
+      setUserData(prev => ({ ...prev, avatar_url, avatar_renditions }))
+      setEditData(prev => ({ ...prev, avatar_url, avatar_renditions }))
       setMessage({ type: 'success', text: 'Photo de profil mise à jour' })
     } catch (error) {
       console.error('Erreur upload:', error)
@@ -159,11 +161,11 @@ function Profil() {
 
     try {
       await usersAPI.deleteAvatar(user.id)
-      const updatedUser = { ...user, avatar_url: null }
+      const updatedUser = { ...user, avatar_url: null, avatar_renditions: null }
       localStorage.setItem('user', JSON.stringify(updatedUser))
 
-      setUserData(prev => ({ ...prev, avatar_url: null }))
-      setEditData(prev => ({ ...prev, avatar_url: null }))
+      setUserData(prev => ({ ...prev, avatar_url: null, avatar_renditions: null }))
+      setEditData(prev => ({ ...prev, avatar_url: null, avatar_renditions: null }))
       setPreviewImage(null)
       setMessage({ type: 'success', text: 'Photo de profil supprimée' })
     } catch (error) {
@@ -288,7 +290,7 @@ function Profil() {
   }
 
   const avatarDisplayData = previewImage
-    ? { ...editData, avatar_url: previewImage }
+    ? { ...editData, avatar_url: previewImage, avatar_renditions: null }
     : (isEditing ? editData : userData)
 
   return (
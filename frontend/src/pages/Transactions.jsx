@@ -24,7 +24,7 @@ function Transactions() {
 	const [loading, setLoading] = useState(true)
 	const [loadingMore, setLoadingMore] = useState(false)
 	const [hasMore, setHasMore] = useState(true)
-	const [offset, setOffset] = useState(0)
+	const [nextCursor, setNextCursor] = useState(null)
 	const LIMIT = 50
 
 	// Filtres et recherche
@@ -47,7 +47,7 @@ function Transactions() {
 		const fetchData = async () => {
 			try {
 				const [transRes, recurRes, accountsRes, catRes] = await Promise.all([
-					transactionsAPI.getByUser(user.id, { limit: LIMIT, offset: 0 }),
+					transactionsAPI.getByUser(user.id, { limit: LIMIT }),
 					recurringAPI.getByUser(user.id),
 					accountsAPI.getByUser(user.id),
 					categoriesAPI.getAll(user.id)
@@ -75,7 +75,8 @@ function Transactions() {
 				setRecurringTransactions(enrichedRecurring)
 				setAccounts(loadedAccounts)
 				setCategories(loadedCategories)
-				setHasMore((transRes.data.transactions || []).length === LIMIT)
+				setNextCursor(transRes.data.next_cursor || null)
+				setHasMore(Boolean(transRes.data.next_cursor))
 			} catch (err) {
 				console.error('Erreur chargement données:', err)
 			} finally {
@@ -100,15 +101,15 @@ function Transactions() {
 
 	// Charger plus de transactions
 	const loadMore = async () => {
-		if (loadingMore || !hasMore) return
+		if (loadingMore || !hasMore || !nextCursor) return
 		setLoadingMore(true)
 		try {
-			const newOffset = offset + LIMIT
-			const response = await transactionsAPI.getByUser(user.id, { limit: LIMIT, offset: newOffset })
+			// Pagination par curseur : reprend après la dernière transaction chargée
+			const response = await transactionsAPI.getByUser(user.id, { limit: LIMIT, cursor: nextCursor })
 			const newTransactions = response.data.transactions || []
 			setTransactions(prev => [...prev, ...newTransactions])
-			setOffset(newOffset)
-			setHasMore(newTransactions.length === LIMIT)
+			setNextCursor(response.data.next_cursor || null)
+			setHasMore(Boolean(response.data.next_cursor))
 		} catch (err) {
 			console.error('Erreur chargement:', err)
 		} finally {
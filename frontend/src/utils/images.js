@@ -0,0 +1,12 @@
+/**
+ * Construit l'attribut srcSet à partir des rendus WebP d'une image importée
+ * @param {Object|null} renditions - URL des rendus par taille (ex: { "32": "/uploads/blobs/..." })
+ * @returns {string|undefined} Le srcSet (ex: "/a_32.webp 32w, /a_64.webp 64w"), undefined sans rendus
+ */
+export const renditionSrcSet = (renditions) => {
+	if (!renditions) return undefined
+	return Object.entries(renditions)
+		.sort(([a], [b]) => Number(a) - Number(b))
+		.map(([size, url]) => `${url} ${size}w`)
+		.join(', ')
+}
@@ -0,0 +1,14 @@
+import { describe, it, expect } from 'vitest'
+import { renditionSrcSet } from './images'
+
+describe('renditionSrcSet', () => {
+	it('liste les rendus du plus petit au plus grand', () => {
+		const result = renditionSrcSet({ 128: '/b_128.webp', 32: '/b_32.webp', 64: '/b_64.webp' })
+		expect(result).toBe('/b_32.webp 32w, /b_64.webp 64w, /b_128.webp 128w')
+	})
+
+	it('retourne undefined sans rendus', () => {
+		expect(renditionSrcSet(null)).toBeUndefined()
+		expect(renditionSrcSet(undefined)).toBeUndefined()
+	})
+})
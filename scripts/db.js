@@ -81,7 +81,11 @@ const commands = {
     console.log("Purge des données...");
     const purgeSQL = `
       SET FOREIGN_KEY_CHECKS = 0;
+      TRUNCATE TABLE mm_data_versions;
       TRUNCATE TABLE mm_advances;
+      TRUNCATE TABLE mm_monthly_aggregates;
+      TRUNCATE TABLE mm_category_closure;
+      TRUNCATE TABLE mm_budget_spending;
       TRUNCATE TABLE mm_transactions;
       TRUNCATE TABLE mm_recurring;
       TRUNCATE TABLE mm_budgets;
@@ -99,6 +103,20 @@ const commands = {
     }
   },
 
+  // Reconstruit les tables dérivées (agrégats, hiérarchie) depuis les transactions
+  rebuild: () => {
+    console.log("Reconstruction des tables dérivées...");
+    const pythonPath = process.platform === "win32"
+      ? path.join(backendDir, "venv", "Scripts", "python.exe")
+      : path.join(backendDir, "venv", "bin", "python");
+    try {
+      execSync(`"${pythonPath}" -m app.rebuild`, { cwd: backendDir, stdio: "inherit" });
+    } catch (error) {
+      console.error("Erreur lors de la reconstruction.");
+      process.exit(1);
+    }
+  },
+
   // Purge + seed (remet un jeu de données propre)
   reset: () => {
     commands.purge();
@@ -152,6 +170,7 @@ if (!action || !commands[action]) {
   console.log("  purge      - Vide toutes les tables (garde la structure)");
   console.log("  reset      - purge + seed (jeu de données propre)");
   console.log("  drop       - Supprime complètement la BDD");
+  console.log("  rebuild    - Reconstruit les tables dérivées (agrégats, hiérarchie, budgets)");
   console.log("  clean-test - Supprime uniquement l'utilisateur de test");
   console.log("  reset-test - clean-test + seed (recrée les données de test)");
   process.exit(1);